@@ -0,0 +1,240 @@
+import os
+# render on a dummy display, so benchmarks run without a window or screen
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import copy
+import gc
+import json
+import sys
+import time
+import tracemalloc
+import numpy as np
+import kernels
+import spatial
+from flock import FlockState
+from linalg import Vector3D, FastVector3D, Vector3DArray
+
+'''
+Benchmark suite for the vector math, the flock step with every neighbor
+search and the render path.
+
+Each benchmark has a setup function returning (run, units, reset): a
+callable to time, how many units (boid updates, vector operations) one call
+does, and a callable putting back whatever state run changes, or None.
+reset is called untimed before every run, so every run does the same work
+however many runs there are. Runs are repeated for at least MIN_TIME
+seconds and the median is reported as throughput in units per second, with
+the peak memory one run allocates as seen by tracemalloc.
+
+Results can be saved as a baseline and later runs compared against it: a
+benchmark whose throughput drops, or whose peak memory grows, by more than
+the tolerance is a regression and makes the script exit with status 1.
+
+  python benchmark.py --save baseline.json
+  python benchmark.py --compare baseline.json
+'''
+class Benchmark:
+  MIN_TIME = 0.5 # seconds to repeat each benchmark for
+  MIN_RUNS = 3
+  MAX_RUNS = 1000
+
+  def __init__(self, name, setup, unit, n=None):
+    self.name = name
+    self.setup = setup
+    self.unit = unit
+    self.n = n # number of boids, if any
+
+  def measure(self):
+    run, units, reset = self.setup()
+    reset = reset or (lambda: None)
+    reset()
+    run() # warm up caches and compiled kernels
+
+    # like timeit, keep garbage collection (of whatever reset made) out of the timings
+    times = []
+    start = time.perf_counter()
+    while len(times) < self.MIN_RUNS or \
+        (time.perf_counter() - start < self.MIN_TIME and len(times) < self.MAX_RUNS):
+      reset()
+      gc.collect()
+      gc.disable()
+      try:
+        t = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t)
+      finally:
+        gc.enable()
+
+    reset()
+    tracemalloc.start()
+    try:
+      run()
+      _, peak = tracemalloc.get_traced_memory()
+    finally:
+      tracemalloc.stop()
+
+    median = float(np.median(times))
+    return {'unit': self.unit, 'runs': len(times), 'time': median,
+            'throughput': units / median, 'peak_memory': peak}
+
+
+BOUNDS = [(0, 1280), (0, 720), (0, 255)]
+SIZES = (50, 500, 5000, 50000)
+BRUTE_MAX = 5000 # brute force is quadratic, skip it for larger flocks
+VECTORS = 1000 # vector operations per linalg benchmark run
+STEPS = 4 # flock steps per step benchmark run, each run starting from the spawned flock
+
+
+def vector_setup(op, vector_type):
+  def setup():
+    rng = np.random.default_rng(0)
+    a = [vector_type(*row) for row in rng.random((VECTORS, 3)).tolist()]
+    b = [vector_type(*row) for row in rng.random((VECTORS, 3)).tolist()]
+    def run():
+      for (u, v) in zip(a, b):
+        op(u, v)
+    return run, VECTORS, None
+  return setup
+
+def vector_array_setup(op):
+  def setup():
+    rng = np.random.default_rng(0)
+    a = Vector3DArray(rng.random((VECTORS, 3)))
+    b = Vector3DArray(rng.random((VECTORS, 3)))
+    return (lambda: op(a, b)), VECTORS, None
+  return setup
+
+'''
+Steps a copy of the same seeded flock every run: a flock bunches up as it
+flies, which changes the cost of a step, and some indexes keep state from
+one step to the next
+'''
+def step_setup(n, neighbors, kernel='numpy'):
+  def setup():
+    spawned = FlockState(n, BOUNDS, np.random.default_rng(0), neighbors, kernel)
+    state = None
+    def reset():
+      nonlocal state
+      state = copy.deepcopy(spawned)
+    def run():
+      for _ in range(STEPS):
+        state.step()
+    return run, n * STEPS, reset
+  return setup
+
+def render_setup(n, mode):
+  def setup():
+    import pygame
+    from rendering import FlockRenderer
+    pygame.display.init()
+    screen = pygame.display.set_mode([int(b) for (_, b) in BOUNDS[:2]])
+    state = FlockState(n, BOUNDS, np.random.default_rng(0))
+    renderer = FlockRenderer(mode=mode)
+    def run():
+      screen.fill((0, 0, 0))
+      renderer.draw(screen, state.positions, state.velocities)
+      pygame.display.flip()
+    return run, n, None
+  return setup
+
+
+def benchmarks():
+  suite = []
+  operations = {
+    'add': lambda u, v: u + v,
+    'mul': lambda u, v: u * 2.0,
+    'dot': lambda u, v: u.dot(v),
+    'cross': lambda u, v: u.cross(v),
+    'abs': lambda u, v: abs(u),
+  }
+  for vector_type in (Vector3D, FastVector3D):
+    for name, op in operations.items():
+      suite.append(Benchmark(f'linalg.{vector_type.__name__}.{name}',
+                             vector_setup(op, vector_type), 'ops'))
+  for name, op in operations.items():
+    suite.append(Benchmark(f'linalg.Vector3DArray.{name}', vector_array_setup(op), 'ops'))
+
+  for neighbors in sorted(spatial.INDEXES):
+    if neighbors == 'kdtree' and spatial.cKDTree is None:
+      continue
+    for n in SIZES:
+      if neighbors == 'brute' and n > BRUTE_MAX:
+        continue
+      suite.append(Benchmark(f'step.{neighbors}.{n}', step_setup(n, neighbors),
+                             'boid updates', n))
+  if kernels.HAVE_NUMBA:
+    for n in SIZES:
+      if n <= BRUTE_MAX:
+        suite.append(Benchmark(f'step.numba.{n}', step_setup(n, 'brute', 'numba'),
+                               'boid updates', n))
+
+  for mode in ('blits', 'pixels'):
+    for n in SIZES:
+      suite.append(Benchmark(f'render.{mode}.{n}', render_setup(n, mode), 'boids', n))
+  return suite
+
+
+'''
+Returns the names of the benchmarks that regressed from the baseline
+'''
+def regressions(results, baseline, tolerance):
+  failed = []
+  for name, result in results.items():
+    base = baseline.get(name)
+    if base is None:
+      continue
+    if result['throughput'] < base['throughput'] / (1 + tolerance) or \
+        result['peak_memory'] > base['peak_memory'] * (1 + tolerance) + 4096:
+      failed.append(name)
+  return failed
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the boids simulation')
+  parser.add_argument('-k', '--filter', default='', help='only run benchmarks whose name contains this')
+  parser.add_argument('--max-boids', type=int, default=max(SIZES),
+                      help='skip flock sizes above this')
+  parser.add_argument('--min-time', type=float, default=Benchmark.MIN_TIME,
+                      help='seconds to repeat each benchmark for')
+  parser.add_argument('--save', metavar='PATH', help='write the results to a baseline file')
+  parser.add_argument('--compare', metavar='PATH', help='compare against a baseline file')
+  parser.add_argument('--tolerance', type=float, default=0.2,
+                      help='allowed slowdown or memory growth, as a fraction')
+  args = parser.parse_args()
+  Benchmark.MIN_TIME = args.min_time
+
+  baseline = {}
+  if args.compare:
+    with open(args.compare) as file:
+      baseline = json.load(file)
+
+  results = {}
+  for benchmark in benchmarks():
+    if args.filter not in benchmark.name:
+      continue
+    if benchmark.n is not None and benchmark.n > args.max_boids:
+      continue
+    result = results[benchmark.name] = benchmark.measure()
+    line = (f"{benchmark.name:<28}{result['throughput']:>14,.0f} {result['unit']}/s"
+            f"{result['peak_memory'] / 1024:>12,.0f} KiB peak")
+    base = baseline.get(benchmark.name)
+    if base is not None:
+      line += f"{result['throughput'] / base['throughput']:>8.2f}x"
+    print(line, flush=True)
+
+  if args.save:
+    with open(args.save, 'w') as file:
+      json.dump(results, file, indent=2)
+
+  if args.compare:
+    failed = regressions(results, baseline, args.tolerance)
+    if failed:
+      print(f'{len(failed)} regressions against {args.compare}: {", ".join(failed)}')
+      sys.exit(1)
+    print(f'no regressions against {args.compare}')
+
+
+if __name__ == '__main__':
+  main()
@@ -1,117 +1,119 @@
 import pygame
 from linalg import Vector3D
 import colors
-import numpy as np
 import utilities
+from threaded import FlockThread
 
 class Boid(utilities.DrawSprite):
-  MARGIN = 100 # how close to edges are boids allowed?
-  TURN_FACTOR = 2 # how quickly do boids avoid edges?
-  MIN_SPEED = 10
-  MAX_SPEED = 15
-  PROTECTED_RANGE = 10 # the range at which boids get paranoid of collisions with others
-  AVOID_FACTOR = 0.1 # how quickly do boids avoid each other in the protected range?
-  VISIBLE_RANGE = 50 # this boid will follow boids within this range
-  MATCHING_FACTOR = 0.2 # how quickly does this boid follow others?
-  CENTERING_FACTOR = 0.005 # how much does this boid stay with others?
-  flock = [] # the existing flock of boids
-
-  def __init__(self, bounds):
+  def __init__(self, state, index):
     # Call the parent class (Sprite) constructor
     pygame.sprite.Sprite.__init__(self)
 
-    # initialize RNG
-    rng = np.random.default_rng()
+    self.state = state # the FlockState holding this boid's row
+    self.index = index
 
-    (self.left, self.right), (self.top, self.bottom), (self.back, self.front) = bounds
-
-    self.areaWidth = self.right - self.left
-    self.areaHeight = self.bottom - self.top
-    self.areaDepth = self.front - self.back
-
-    x = self.left + self.areaWidth * rng.random()
-    y = self.top + self.areaHeight * rng.random()
-    z = self.back + self.areaDepth * rng.random()
-    vx = 5 * (1 + rng.random())
-    vy = 5 * (1 + rng.random())
-    vz = 10 * rng.random()
-
-    self.position = Vector3D(x, y, z)
-    self.velocity = Vector3D(vx, vy, vz)
-    self.closeness = Vector3D.zero()
     self.width = 5
-    self.rect = pygame.Rect(self.position.X - self.width / 2, 
+    self.rect = pygame.Rect(self.position.X - self.width / 2,
                             self.position.Y - self.width / 2,
                             self.width, self.width)
     self.image = pygame.Surface([self.width, self.width], flags=pygame.SRCALPHA)
 
-    Boid.flock.append(self)
+  # zero-copy views of this boid's rows in the flock state
+  @property
+  def position(self):
+    return Vector3D.view(self.state.positions[self.index])
+
+  @property
+  def velocity(self):
+    return Vector3D.view(self.state.velocities[self.index])
 
   @property
   def color(self):
     return *colors.WHITE, self.position.Z
 
-  def constrain_speed(self):
-    speed = abs(self.velocity)
-    if speed > Boid.MAX_SPEED:
-      self.velocity = (self.velocity * Boid.MAX_SPEED) / speed
-    if speed < Boid.MIN_SPEED:
-      self.velocity = (self.velocity * Boid.MIN_SPEED) / speed
-
-  def avoid_edges(self):
-    if self.position.X < self.left + Boid.MARGIN:
-      self.velocity.X += Boid.TURN_FACTOR
-    if self.position.X > self.right - Boid.MARGIN:
-      self.velocity.X -= Boid.TURN_FACTOR
-    if self.position.Y < self.top + Boid.MARGIN:
-      self.velocity.Y += Boid.TURN_FACTOR
-    if self.position.Y > self.bottom - Boid.MARGIN:
-      self.velocity.Y -= Boid.TURN_FACTOR
-    if self.position.Z < self.back + Boid.MARGIN:
-      self.velocity.Z += Boid.TURN_FACTOR
-    if self.position.Z > self.front - 50:
-      self.velocity.Z -= Boid.TURN_FACTOR
-
-  def constrain_position(self):
-    self.position.X = utilities.constrain(self.position.X, self.left, self.right)
-    self.position.Y = utilities.constrain(self.position.Y, self.top, self.bottom)
-    self.position.Z = utilities.constrain(self.position.Z, self.back + (self.areaDepth * 0.5), self.front)
-
-  def avoid_other_boids(self):
-    self.velocity += self.closeness * Boid.AVOID_FACTOR
-
-  def follow_neighbors(self):
-    if self.num_neighbors > 0:
-      self.avg_velocity /= self.num_neighbors
-      self.avg_position /= self.num_neighbors
-      self.velocity += (self.avg_velocity - self.velocity) * Boid.MATCHING_FACTOR
-      self.velocity += (self.avg_position - self.position) * Boid.CENTERING_FACTOR
-
-  def fly_with_flock(self):
-    self.closeness = Vector3D.zero()
-    self.avg_velocity = Vector3D.zero()
-    self.avg_position = Vector3D.zero()
-    self.num_neighbors = 0
-    for other in Boid.flock:
-      if self is not other:
-        distance = abs(self.position - other.position)
-        if distance < Boid.PROTECTED_RANGE:
-          self.closeness += self.position - other.position
-        if distance < Boid.VISIBLE_RANGE:
-          self.avg_velocity += other.velocity
-          self.avg_position += other.position
-          self.num_neighbors += 1
-    self.avoid_other_boids()
-    self.follow_neighbors()
-
-
   def update(self):
-    self.fly_with_flock()
-    self.avoid_edges()
-    self.constrain_speed()
-    self.position += self.velocity
-    self.constrain_position()
-    self.rect = pygame.Rect(self.position.X - self.width / 2, 
+    self.rect = pygame.Rect(self.position.X - self.width / 2,
                             self.position.Y - self.width / 2,
                             self.width, self.width)
-    self.image.fill(self.color)
\ No newline at end of file
+    self.image.fill(self.color)
+
+
+'''
+Owns one scene's flock: the FlockState, a Boid sprite per row of it, and the
+FlockThread stepping it when threaded. Nothing about a flock is shared
+between scenes, and close() releases all of it, so leaving and re-entering
+the boids scene never accumulates boids.
+
+The renderer draws straight from the state, so the Boid sprites are only
+created the first time boids is used.
+
+state: the FlockState to own
+threaded: step on a background FlockThread at rate frames per second instead
+of in step()
+'''
+class Flock:
+  def __init__(self, state, threaded=False, rate=60):
+    self.state = state
+    self._boids = None
+    self.thread = FlockThread(state, rate).start() if threaded else None
+    self.closed = False
+
+  def __len__(self):
+    return len(self.state)
+
+  def __iter__(self):
+    return iter(self.boids)
+
+  @property
+  def boids(self):
+    if self._boids is None:
+      self._boids = pygame.sprite.Group([Boid(self.state, i) for i in range(len(self.state))])
+    return self._boids
+
+  def step(self, dt=1.0):
+    if self.thread is None:
+      self.state.step(dt)
+
+  def pause(self):
+    if self.thread is not None:
+      self.thread.pause()
+
+  def resume(self):
+    if self.thread is not None:
+      self.thread.resume()
+
+  '''
+  Returns the positions and velocities to draw, interpolated a fraction alpha
+  of a step ahead of the previous one when alpha is given. A threaded flock
+  uses its latest snapshot and works out alpha from the time it was taken.
+  '''
+  def frame(self, alpha=None, out=None):
+    if self.thread is not None:
+      snapshot = self.thread.latest()
+      if alpha is None:
+        return snapshot.positions, snapshot.velocities
+      return snapshot.interpolate(self.thread.alpha(snapshot), out), snapshot.velocities
+    if alpha is None:
+      return self.state.positions, self.state.velocities
+    return self.state.interpolate(alpha, out), self.state.velocities
+
+  '''
+  Stops the thread and drops every boid. The flock can't be used afterwards.
+  '''
+  def close(self):
+    if self.closed:
+      return
+    if self.thread is not None:
+      self.thread.stop()
+      self.thread = None
+    if self._boids is not None:
+      self._boids.empty()
+    if hasattr(self.state, 'close'):
+      self.state.close()
+    self.closed = True
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
@@ -0,0 +1,281 @@
+import numpy as np
+import warnings
+import spatial
+import kernels
+import profiling
+import spawning
+
+'''
+Holds the state of a whole flock of boids in contiguous (N, 3) arrays and
+steps every boid at once with vectorized NumPy operations.
+
+Positions and velocities are double-buffered: a step reads every boid from
+the front buffers (frame t) and writes into the back buffers (frame t+1),
+then swaps them. Since no boid sees another's new state mid-step, rows can
+be updated in any order or split between workers with the same result.
+'''
+class FlockState:
+  MARGIN = 100 # how close to edges are boids allowed?
+  FRONT_MARGIN = 50 # margin at the front of the area
+  TURN_FACTOR = 2 # how quickly do boids avoid edges?
+  MIN_SPEED = 10
+  MAX_SPEED = 15
+  PROTECTED_RANGE = 10 # the range at which boids get paranoid of collisions with others
+  AVOID_FACTOR = 0.1 # how quickly do boids avoid each other in the protected range?
+  VISIBLE_RANGE = 50 # boids will follow others within this range
+  MATCHING_FACTOR = 0.2 # how quickly do boids follow others?
+  CENTERING_FACTOR = 0.005 # how much do boids stay with others?
+
+  def __init__(self, n, bounds, rng=None, neighbors='grid', kernel='numpy', params=None,
+               spawn='uniform'):
+    # override any of the tunable parameters above for this flock only
+    for name, value in (params or {}).items():
+      if not (name.isupper() and hasattr(FlockState, name)):
+        raise ValueError(f'Unknown flock parameter {name!r}')
+      setattr(self, name, value)
+
+    # initialize RNG
+    if rng is None:
+      rng = np.random.default_rng()
+
+    self.n = n
+    self.bounds = np.array(bounds, dtype=float)
+    (self.left, self.right), (self.top, self.bottom), (self.back, self.front) = bounds
+
+    self.low = self.bounds[:, 0]
+    self.high = self.bounds[:, 1]
+    self.size = self.high - self.low
+
+    # boids start turning once inside these limits...
+    self.edge_low = self.low + self.MARGIN
+    self.edge_high = self.high - [self.MARGIN, self.MARGIN, self.FRONT_MARGIN]
+    # ...and are never allowed outside of these
+    self.position_low = self.low + [0, 0, self.size[2] * 0.5]
+    self.position_high = self.high
+
+    # front and back buffers, self.current indexes the front one
+    self.position_buffers = np.zeros((2, n, 3))
+    self.velocity_buffers = np.zeros((2, n, 3))
+    self.current = 0
+
+    # all boids are drawn at once, spawn names a distribution in spawning.py
+    self.positions[...] = spawning.spawn(spawn, rng, n, self.low, self.high)
+    self.velocities[:, :2] = 5 * (1 + rng.random((n, 2)))
+    self.velocities[:, 2] = 10 * rng.random(n)
+    # the back buffer starts as a copy, so it is a valid previous frame
+    self.next_positions[...] = self.positions
+    self.next_velocities[...] = self.velocities
+
+    # neighbor accumulators, refreshed every step
+    self.closeness = np.zeros((n, 3))
+    self.avg_velocity = np.zeros((n, 3))
+    self.avg_position = np.zeros((n, 3))
+    self.num_neighbors = np.zeros(n, dtype=int)
+
+    # spatial index used for neighbor search: 'brute', 'grid', 'kdtree', 'verlet',
+    # the approximate 'octree', the topological 'knn' or an index object
+    self.index = spatial.create_index(neighbors, self.VISIBLE_RANGE)
+
+    # 'numpy' steps with the vectorized rules below, 'numba' with a compiled
+    # brute-force kernel that does its own neighbor search
+    if kernel not in ('numpy', 'numba'):
+      raise ValueError(f"Unknown kernel {kernel!r}, expected 'numpy' or 'numba'")
+    # the kernel only knows the metric rules, it can't follow the topological
+    # neighbors or the approximate sums of these indexes
+    if kernel == 'numba' and (self.index.TOPOLOGICAL or self.index.APPROXIMATE):
+      raise ValueError(f'The numba kernel does its own metric neighbor search, '
+                       f'it can\'t run with the {type(self.index).__name__} index')
+    if kernel == 'numba' and not kernels.HAVE_NUMBA:
+      warnings.warn('numba is not installed, falling back to the numpy kernel')
+      kernel = 'numpy'
+    self.kernel = kernel
+
+    # times the phases of each step when set to a profiling.Profiler
+    self.profiler = profiling.NULL
+
+  def __len__(self):
+    return self.n
+
+  '''
+  Returns the tunable parameters of this flock by name
+  '''
+  @property
+  def params(self):
+    return {name: getattr(self, name) for name in dir(FlockState)
+            if name.isupper()}
+
+  # the current frame, read by a step
+  @property
+  def positions(self):
+    return self.position_buffers[self.current]
+
+  @property
+  def velocities(self):
+    return self.velocity_buffers[self.current]
+
+  # the next frame, written by a step
+  @property
+  def next_positions(self):
+    return self.position_buffers[1 - self.current]
+
+  @property
+  def next_velocities(self):
+    return self.velocity_buffers[1 - self.current]
+
+  def swap(self):
+    self.current = 1 - self.current
+
+  '''
+  Refreshes the neighbor accumulators of the given rows from the current
+  frame, which the spatial index must have been built from
+  '''
+  def fly_with_flock(self, rows=slice(None)):
+    if self.index.APPROXIMATE:
+      self.fly_with_aggregates(rows)
+      return
+    positions, velocities = self.positions, self.velocities
+    lo, hi = spatial.row_range(rows, self.n)
+    # topological neighbors are followed however far they are
+    visible_range = np.inf if self.index.TOPOLOGICAL else self.VISIBLE_RANGE
+    # one query answers both ranges, they are told apart by distance
+    indptr, cols, distances = self.index.query_csr(max(self.PROTECTED_RANGE,
+                                                       visible_range),
+                                                   rows)
+    owners = np.repeat(np.arange(lo, hi), np.diff(indptr))
+
+    visible = (distances < visible_range)[:, np.newaxis]
+    spatial.reduce_rows(indptr, velocities[cols] * visible, self.avg_velocity[rows])
+    spatial.reduce_rows(indptr, positions[cols] * visible, self.avg_position[rows])
+    self.num_neighbors[rows] = np.bincount(owners - lo, weights=visible[:, 0],
+                                           minlength=hi - lo)
+
+    protected = (distances < self.PROTECTED_RANGE)[:, np.newaxis]
+    spatial.reduce_rows(indptr, (positions[owners] - positions[cols]) * protected,
+                        self.closeness[rows])
+
+  '''
+  Like fly_with_flock, for approximate indexes like spatial.Octree: the
+  protected range is still searched pair by pair, but the visible neighbors
+  only come as aggregate counts and sums, which may be approximated
+  '''
+  def fly_with_aggregates(self, rows=slice(None)):
+    positions, velocities = self.positions, self.velocities
+    lo, hi = spatial.row_range(rows, self.n)
+    indptr, cols, _ = self.index.query_csr(self.PROTECTED_RANGE, rows)
+    owners = np.repeat(np.arange(lo, hi), np.diff(indptr))
+    spatial.reduce_rows(indptr, positions[owners] - positions[cols], self.closeness[rows])
+
+    counts, sums = self.index.query_sums(self.VISIBLE_RANGE,
+                                         np.hstack([positions, velocities]), rows)
+    self.num_neighbors[rows] = np.rint(counts)
+    self.avg_position[rows] = sums[:, :3]
+    self.avg_velocity[rows] = sums[:, 3:]
+
+  # The steering rules below write the next velocities of the given rows,
+  # reading only the current frame and the neighbor accumulators.
+
+  def avoid_other_boids(self, rows=slice(None)):
+    self.next_velocities[rows] += self.closeness[rows] * self.AVOID_FACTOR
+
+  def follow_neighbors(self, rows=slice(None)):
+    has_neighbors = self.num_neighbors[rows] > 0
+    count = self.num_neighbors[rows][has_neighbors, np.newaxis]
+    avg_velocity = self.avg_velocity[rows]
+    avg_position = self.avg_position[rows]
+    avg_velocity[has_neighbors] /= count
+    avg_position[has_neighbors] /= count
+
+    next_velocities = self.next_velocities[rows]
+    velocities = next_velocities[has_neighbors]
+    velocities += (avg_velocity[has_neighbors] - velocities) * self.MATCHING_FACTOR
+    velocities += (avg_position[has_neighbors] - self.positions[rows][has_neighbors]) * self.CENTERING_FACTOR
+    next_velocities[has_neighbors] = velocities
+
+  def avoid_edges(self, rows=slice(None)):
+    positions = self.positions[rows]
+    next_velocities = self.next_velocities[rows]
+    next_velocities += self.TURN_FACTOR * (positions < self.edge_low)
+    next_velocities -= self.TURN_FACTOR * (positions > self.edge_high)
+
+  def constrain_speed(self, rows=slice(None)):
+    next_velocities = self.next_velocities[rows]
+    speed = np.sqrt(np.einsum('ij,ij->i', next_velocities, next_velocities))
+    limited = np.clip(speed, self.MIN_SPEED, self.MAX_SPEED)
+    scale = np.divide(limited, speed, out=np.ones_like(speed), where=speed > 0)
+    next_velocities *= scale[:, np.newaxis]
+
+  def constrain_position(self, rows=slice(None)):
+    next_positions = self.next_positions[rows]
+    np.clip(next_positions, self.position_low, self.position_high, out=next_positions)
+
+  '''
+  Writes the velocities dt frames ahead for the given rows. The steering
+  rules are tuned per frame at 60 FPS, so their changes to the velocity are
+  scaled by dt before the speed limits apply.
+  '''
+  def steer_rows(self, rows=slice(None), dt=1.0):
+    velocities = self.velocities[rows]
+    next_velocities = self.next_velocities[rows]
+    next_velocities[...] = velocities
+    self.avoid_other_boids(rows)
+    self.follow_neighbors(rows)
+    self.avoid_edges(rows)
+    if dt != 1:
+      next_velocities -= velocities
+      next_velocities *= dt
+      next_velocities += velocities
+    self.constrain_speed(rows)
+
+  '''
+  Writes the positions dt frames ahead for the given rows from their next
+  velocities
+  '''
+  def integrate_rows(self, rows=slice(None), dt=1.0):
+    next_velocities = self.next_velocities[rows]
+    next_positions = self.next_positions[rows]
+    if dt != 1:
+      np.multiply(next_velocities, dt, out=next_positions)
+      next_positions += self.positions[rows]
+    else:
+      np.add(self.positions[rows], next_velocities, out=next_positions)
+    self.constrain_position(rows)
+
+  '''
+  Writes the state dt frames ahead for the given rows from the current frame
+  '''
+  def update_rows(self, rows=slice(None), dt=1.0):
+    self.steer_rows(rows, dt)
+    self.integrate_rows(rows, dt)
+
+  '''
+  Advances every boid in the flock by dt frames. The profiler times the
+  'neighbors', 'steering' and 'integration' phases; the numba kernel does
+  all three in one pass, timed as 'steering'.
+  '''
+  def step(self, dt=1.0):
+    profiler = self.profiler
+    if self.kernel == 'numba':
+      with profiler.phase('steering'):
+        kernels.steer(self, dt)
+    else:
+      with profiler.phase('neighbors'):
+        self.index.build(self.positions)
+        self.fly_with_flock()
+      with profiler.phase('steering'):
+        self.steer_rows(dt=dt)
+      with profiler.phase('integration'):
+        self.integrate_rows(dt=dt)
+    self.swap()
+
+  '''
+  Returns positions blended between the previous frame (alpha = 0) and the
+  current one (alpha = 1), for rendering between fixed simulation steps
+  '''
+  def interpolate(self, alpha, out=None):
+    if out is None:
+      out = np.empty_like(self.positions)
+    previous = self.next_positions # holds the previous frame until the next step
+    np.subtract(self.positions, previous, out=out)
+    out *= alpha
+    out += previous
+    return out
@@ -0,0 +1,123 @@
+import numpy as np
+import math
+
+try:
+  from numba import njit, prange
+except ImportError:
+  njit = None
+
+'''
+Compiled flock kernels. Numba is optional: HAVE_NUMBA tells whether the
+kernels are available, and FlockState falls back to its NumPy path without.
+
+The kernel checks every pair of boids in a compiled loop, which avoids the
+temporaries of the vectorized path and is often faster for mid-size flocks.
+'''
+HAVE_NUMBA = njit is not None
+
+if HAVE_NUMBA:
+  @njit(parallel=True, cache=True)
+  def _steer(positions, velocities, next_positions, next_velocities,
+             closeness, avg_velocity, avg_position, num_neighbors,
+             edge_low, edge_high, position_low, position_high,
+             protected_range, visible_range, avoid_factor, matching_factor,
+             centering_factor, turn_factor, min_speed, max_speed, dt):
+    n = positions.shape[0]
+    for i in prange(n):
+      cx = cy = cz = 0.0
+      vx = vy = vz = 0.0
+      px = py = pz = 0.0
+      count = 0
+      xi, yi, zi = positions[i, 0], positions[i, 1], positions[i, 2]
+      for j in range(n):
+        if i == j:
+          continue
+        dx = xi - positions[j, 0]
+        dy = yi - positions[j, 1]
+        dz = zi - positions[j, 2]
+        distance = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if distance < protected_range:
+          cx += dx
+          cy += dy
+          cz += dz
+        if distance < visible_range:
+          vx += velocities[j, 0]
+          vy += velocities[j, 1]
+          vz += velocities[j, 2]
+          px += positions[j, 0]
+          py += positions[j, 1]
+          pz += positions[j, 2]
+          count += 1
+
+      closeness[i, 0], closeness[i, 1], closeness[i, 2] = cx, cy, cz
+      num_neighbors[i] = count
+
+      # avoid other boids
+      ux = velocities[i, 0] + cx * avoid_factor
+      uy = velocities[i, 1] + cy * avoid_factor
+      uz = velocities[i, 2] + cz * avoid_factor
+
+      # follow neighbors
+      if count > 0:
+        vx /= count
+        vy /= count
+        vz /= count
+        px /= count
+        py /= count
+        pz /= count
+        ux += (vx - ux) * matching_factor
+        uy += (vy - uy) * matching_factor
+        uz += (vz - uz) * matching_factor
+        ux += (px - xi) * centering_factor
+        uy += (py - yi) * centering_factor
+        uz += (pz - zi) * centering_factor
+      avg_velocity[i, 0], avg_velocity[i, 1], avg_velocity[i, 2] = vx, vy, vz
+      avg_position[i, 0], avg_position[i, 1], avg_position[i, 2] = px, py, pz
+
+      # avoid edges
+      if xi < edge_low[0]:
+        ux += turn_factor
+      if xi > edge_high[0]:
+        ux -= turn_factor
+      if yi < edge_low[1]:
+        uy += turn_factor
+      if yi > edge_high[1]:
+        uy -= turn_factor
+      if zi < edge_low[2]:
+        uz += turn_factor
+      if zi > edge_high[2]:
+        uz -= turn_factor
+
+      # scale the steering changes to the time step
+      ux = velocities[i, 0] + (ux - velocities[i, 0]) * dt
+      uy = velocities[i, 1] + (uy - velocities[i, 1]) * dt
+      uz = velocities[i, 2] + (uz - velocities[i, 2]) * dt
+
+      # constrain speed
+      speed = math.sqrt(ux * ux + uy * uy + uz * uz)
+      if speed > 0:
+        scale = min(max(speed, min_speed), max_speed) / speed
+        ux *= scale
+        uy *= scale
+        uz *= scale
+
+      next_velocities[i, 0], next_velocities[i, 1], next_velocities[i, 2] = ux, uy, uz
+      next_positions[i, 0] = min(max(xi + ux * dt, position_low[0]), position_high[0])
+      next_positions[i, 1] = min(max(yi + uy * dt, position_low[1]), position_high[1])
+      next_positions[i, 2] = min(max(zi + uz * dt, position_low[2]), position_high[2])
+
+
+'''
+Writes the state of a FlockState dt frames ahead with the compiled kernel
+'''
+def steer(state, dt=1.0):
+  _steer(state.positions, state.velocities,
+         state.next_positions, state.next_velocities,
+         state.closeness, state.avg_velocity, state.avg_position,
+         state.num_neighbors,
+         state.edge_low, state.edge_high,
+         state.position_low, state.position_high,
+         float(state.PROTECTED_RANGE), float(state.VISIBLE_RANGE),
+         float(state.AVOID_FACTOR), float(state.MATCHING_FACTOR),
+         float(state.CENTERING_FACTOR), float(state.TURN_FACTOR),
+         float(state.MIN_SPEED), float(state.MAX_SPEED), float(dt))
@@ -7,6 +7,8 @@ import math
 Implements an N-dimensional column vector of real numbers.
 '''
 class Vector:
+    _view = False # whether data is someone else's array, see view()
+
     def __init__(self, data):
         try:
             iter(data)
@@ -37,7 +39,7 @@ class Vector:
                 return False
             return all(x == y for (x, y) in zip(self.data, other))
         else:
-            return False
+            return NotImplemented
 
     '''
     Returns addition of vector with a scalar or vector of same length
@@ -140,25 +142,109 @@ class Vector:
     def zeros(n):
         return Vector(np.zeros(n))
 
-    def __iadd__(self, other):
+    '''
+    Wraps an existing 1D array without validating or copying it, so writes
+    to the vector go straight to the array
+    '''
+    @classmethod
+    def view(cls, data):
+        v = cls.__new__(cls)
+        v.data = data
+        v._view = True
+        return v
+
+    '''
+    Makes sure the buffer can hold the result of an in-place operation with
+    other, which gives integer vectors a float buffer when needed. A view
+    can't be given a new buffer without losing its array, so it raises
+    TypeError instead.
+    '''
+    def _promote(self, other, division=False):
+        dtype = np.result_type(self.data, other, *([1.0] if division else []))
+        if dtype != self.data.dtype:
+            if self._view:
+                raise TypeError(f'Cannot store {dtype} results in place '
+                                f'in a view of a {self.data.dtype} array')
+            self.data = self.data.astype(dtype)
+
+    def _inplace_operand(self, other):
         if isinstance(other, Vector):
-            self.data += other.data
-            return self
+            if len(self.data) != len(other.data):
+                raise ValueError('Incompatible vector dimensions')
+            return other.data
         elif isinstance(other, Number):
-            self.data += other
-            return self
-        else:
-            raise TypeError("Other must be a scalar or Vector")
+            return other
+        try:
+            values = tuple(other)
+        except TypeError as te:
+            raise TypeError("Other must be a scalar "
+                            "or iterable of same length")
+        if len(values) != len(self.data) or \
+                not all(isinstance(x, Number) for x in values):
+            raise TypeError("Other must be a scalar "
+                            "or iterable of same length")
+        return np.array(values)
+
+    def __iadd__(self, other):
+        other = self._inplace_operand(other)
+        self._promote(other)
+        self.data += other
+        return self
 
     def __isub__(self, other):
-        if isinstance(other, Vector):
-            self.data -= other.data
-            return self
-        elif isinstance(other, Number):
-            self.data -= other
-            return self
-        else:
-            raise TypeError("Other must be a scalar or Vector")
+        other = self._inplace_operand(other)
+        self._promote(other)
+        self.data -= other
+        return self
+
+    '''
+    Multiplies the vector in place by a scalar or elementwise by a vector
+    '''
+    def __imul__(self, other):
+        other = self._inplace_operand(other)
+        self._promote(other)
+        self.data *= other
+        return self
+
+    '''
+    Divides the vector in place by a scalar or elementwise by a vector
+    '''
+    def __itruediv__(self, other):
+        other = self._inplace_operand(other)
+        self._promote(other, division=True)
+        self.data /= other
+        return self
+
+    '''
+    Scales the vector in place to unit length. Zero vectors are left as they are.
+    '''
+    def normalize_(self):
+        norm = abs(self)
+        if norm > 0:
+            self /= norm
+        return self
+
+    '''
+    Rescales the vector in place so its norm lies between low and high.
+    Zero vectors are left as they are.
+    '''
+    def clamp_norm_(self, low, high):
+        norm = abs(self)
+        if norm > 0:
+            clamped = min(max(norm, low), high)
+            if clamped != norm:
+                self *= clamped / norm
+        return self
+
+    '''
+    Adds k times other to the vector in place
+    '''
+    def add_scaled_(self, other, k):
+        other = self._inplace_operand(other)
+        self._promote(other)
+        self._promote(k)
+        self.data += k * other
+        return self
 
     def __str__(self):
         return str(self.data)
@@ -506,3 +592,700 @@ class Vector3D(Vector):
             return Vector3D(np.cross(self.data, other.data))
         else:
             raise TypeError("Other must be a Vector3D")
+
+
+'''
+Implements a 3-dimensional vector of real numbers stored as three float
+fields rather than an ndarray, for hot paths where Vector3D's validation and
+array allocations dominate.
+
+FastVector3D._make(x, y, z) is a trusted constructor that skips validation;
+the arguments must already be floats.
+'''
+class FastVector3D:
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, *args):
+        n = len(args)
+        if n == 1:
+            try:
+                args = tuple(args[0])
+            except TypeError as te:
+                raise TypeError('Invalid iterable data')
+            n = len(args)
+        if n != 3:
+            raise TypeError('Only 3 dimensions are allowed')
+        if not all(isinstance(v, Number) for v in args):
+            raise ValueError('Invalid numeric data')
+        self.x, self.y, self.z = float(args[0]), float(args[1]), float(args[2])
+
+    @classmethod
+    def _make(cls, x, y, z):
+        v = object.__new__(cls)
+        v.x = x
+        v.y = y
+        v.z = z
+        return v
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, key):
+        return (self.x, self.y, self.z)[key]
+
+    def __eq__(self, other):
+        if isinstance(other, FastVector3D):
+            return self.x == other.x and self.y == other.y and self.z == other.z
+        elif isinstance(other, (Vector, list, tuple)):
+            if len(other.data if isinstance(other, Vector) else other) != 3:
+                return False
+            return all(a == b for (a, b) in zip(self, other))
+        else:
+            return NotImplemented
+
+    __hash__ = None
+
+    '''
+    Returns addition of vector with a scalar or vector of same length
+    '''
+    def __add__(self, other):
+        if isinstance(other, FastVector3D):
+            return FastVector3D._make(self.x + other.x, self.y + other.y, self.z + other.z)
+        elif isinstance(other, Number):
+            return FastVector3D._make(self.x + other, self.y + other, self.z + other)
+        else:
+            x, y, z = self._unpack(other)
+            return FastVector3D._make(self.x + x, self.y + y, self.z + z)
+
+    '''
+    Returns subtraction of a scalar or vector of same length from vector
+    '''
+    def __sub__(self, other):
+        if isinstance(other, FastVector3D):
+            return FastVector3D._make(self.x - other.x, self.y - other.y, self.z - other.z)
+        elif isinstance(other, Number):
+            return FastVector3D._make(self.x - other, self.y - other, self.z - other)
+        else:
+            x, y, z = self._unpack(other)
+            return FastVector3D._make(self.x - x, self.y - y, self.z - z)
+
+    def __neg__(self):
+        return FastVector3D._make(-self.x, -self.y, -self.z)
+
+    '''
+    Returns scalar or elementwise multiplication of vector
+    '''
+    def __mul__(self, other):
+        if isinstance(other, Number):
+            return FastVector3D._make(self.x * other, self.y * other, self.z * other)
+        elif isinstance(other, FastVector3D):
+            return FastVector3D._make(self.x * other.x, self.y * other.y, self.z * other.z)
+        else:
+            x, y, z = self._unpack(other)
+            return FastVector3D._make(self.x * x, self.y * y, self.z * z)
+
+    __rmul__ = __mul__
+
+    '''
+    Returns scalar or elementwise division of vector
+    '''
+    def __truediv__(self, other):
+        if isinstance(other, Number):
+            return FastVector3D._make(self.x / other, self.y / other, self.z / other)
+        elif isinstance(other, FastVector3D):
+            return FastVector3D._make(self.x / other.x, self.y / other.y, self.z / other.z)
+        else:
+            x, y, z = self._unpack(other)
+            return FastVector3D._make(self.x / x, self.y / y, self.z / z)
+
+    def __iadd__(self, other):
+        if isinstance(other, FastVector3D):
+            self.x += other.x
+            self.y += other.y
+            self.z += other.z
+        elif isinstance(other, Number):
+            self.x += other
+            self.y += other
+            self.z += other
+        else:
+            x, y, z = self._unpack(other)
+            self.x += x
+            self.y += y
+            self.z += z
+        return self
+
+    def __isub__(self, other):
+        if isinstance(other, FastVector3D):
+            self.x -= other.x
+            self.y -= other.y
+            self.z -= other.z
+        elif isinstance(other, Number):
+            self.x -= other
+            self.y -= other
+            self.z -= other
+        else:
+            x, y, z = self._unpack(other)
+            self.x -= x
+            self.y -= y
+            self.z -= z
+        return self
+
+    '''
+    Multiplies the vector in place by a scalar or elementwise by a vector
+    '''
+    def __imul__(self, other):
+        if isinstance(other, Number):
+            self.x *= other
+            self.y *= other
+            self.z *= other
+        elif isinstance(other, FastVector3D):
+            self.x *= other.x
+            self.y *= other.y
+            self.z *= other.z
+        else:
+            x, y, z = self._unpack(other)
+            self.x *= x
+            self.y *= y
+            self.z *= z
+        return self
+
+    '''
+    Divides the vector in place by a scalar or elementwise by a vector
+    '''
+    def __itruediv__(self, other):
+        if isinstance(other, Number):
+            self.x /= other
+            self.y /= other
+            self.z /= other
+        elif isinstance(other, FastVector3D):
+            self.x /= other.x
+            self.y /= other.y
+            self.z /= other.z
+        else:
+            x, y, z = self._unpack(other)
+            self.x /= x
+            self.y /= y
+            self.z /= z
+        return self
+
+    '''
+    Scales the vector in place to unit length. Zero vectors are left as they are.
+    '''
+    def normalize_(self):
+        norm = abs(self)
+        if norm > 0:
+            self.x /= norm
+            self.y /= norm
+            self.z /= norm
+        return self
+
+    '''
+    Rescales the vector in place so its norm lies between low and high.
+    Zero vectors are left as they are.
+    '''
+    def clamp_norm_(self, low, high):
+        norm = abs(self)
+        if norm > 0:
+            clamped = min(max(norm, low), high)
+            if clamped != norm:
+                scale = clamped / norm
+                self.x *= scale
+                self.y *= scale
+                self.z *= scale
+        return self
+
+    '''
+    Adds k times other to the vector in place
+    '''
+    def add_scaled_(self, other, k):
+        if isinstance(other, FastVector3D):
+            x, y, z = other.x, other.y, other.z
+        else:
+            x, y, z = self._unpack(other)
+        self.x += k * x
+        self.y += k * y
+        self.z += k * z
+        return self
+
+    def _unpack(self, other):
+        try:
+            x, y, z = other
+        except (TypeError, ValueError) as e:
+            raise TypeError("Other must be a scalar "
+                            "or iterable of same length")
+        return x, y, z
+
+    '''
+    Returns vector dot product
+    '''
+    def dot(self, other):
+        if isinstance(other, FastVector3D):
+            return self.x * other.x + self.y * other.y + self.z * other.z
+        x, y, z = self._unpack(other)
+        return self.x * x + self.y * y + self.z * z
+
+    '''
+    Returns vector cross product
+    '''
+    def cross(self, other):
+        if not isinstance(other, FastVector3D):
+            raise TypeError("Other must be a FastVector3D")
+        return FastVector3D._make(self.y * other.z - self.z * other.y,
+                                  self.z * other.x - self.x * other.z,
+                                  self.x * other.y - self.y * other.x)
+
+    '''
+    Returns the H2 norm of the vector
+    '''
+    def __abs__(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def __str__(self):
+        return f'[{self.x} {self.y} {self.z}]'
+
+    def __repr__(self):
+        return f'FastVector3D({self.x!r}, {self.y!r}, {self.z!r})'
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def data(self):
+        return np.array((self.x, self.y, self.z))
+
+    @property
+    def X(self):
+        return self.x
+
+    @property
+    def Y(self):
+        return self.y
+
+    @property
+    def Z(self):
+        return self.z
+
+    @property
+    def XYZ(self):
+        return (self.x, self.y, self.z)
+
+    @X.setter
+    def X(self, x):
+        self.x = x
+
+    @Y.setter
+    def Y(self, y):
+        self.y = y
+
+    @Z.setter
+    def Z(self, z):
+        self.z = z
+
+    '''
+    Gets spherical coordinates (physics standard) for the vector
+
+    r: radial distance from origin
+    theta: polar angle (0 to pi), where theta=0 in z-axis
+    phi: azimuthal angle (0 to 2pi), where phi=0 in x-axis
+    '''
+    def getSphericalCoords(self):
+        r = abs(self)
+        theta = math.acos(self.z/r)
+        phi = math.atan2(self.y, self.x)
+        return (r, theta, phi)
+
+    '''
+    Gets cylindrical coordinates for the vector
+
+    s: radial distance from origin
+    phi: azimuthal angle (0 to 2pi), where phi=0 in x-axis
+    z: height from origin
+    '''
+    def getCylindricalCoords(self):
+        s = math.sqrt(self.x**2 + self.y**2)
+        phi = math.atan2(self.y, self.x)
+        return (s, phi, self.z)
+
+    '''
+    Creates a 3D vector using spherical coordinates (physics standard)
+    '''
+    @staticmethod
+    def createSpherical(r, theta, phi):
+        return FastVector3D._make(r*math.sin(theta)*math.cos(phi),
+                                  r*math.sin(theta)*math.sin(phi),
+                                  r*math.cos(theta))
+
+    '''
+    Creates a 3D vector using cylindrical coordinates
+    '''
+    @staticmethod
+    def createCylindrical(s, phi, z):
+        return FastVector3D._make(s*math.cos(phi), s*math.sin(phi), float(z))
+
+    '''
+    Returns a deep copy of the vector
+    '''
+    def copy(self):
+        return FastVector3D._make(self.x, self.y, self.z)
+
+    @staticmethod
+    def zero():
+        return FastVector3D._make(0.0, 0.0, 0.0)
+
+    '''
+    Returns an equivalent ndarray-backed Vector3D
+    '''
+    def toVector3D(self):
+        return Vector3D(self.x, self.y, self.z)
+
+
+'''
+Implements an array of N vectors of the same dimension, backed by one (N, d)
+ndarray so that operations run over every row at once.
+
+Indexing a single row returns a vector sharing memory with the array.
+Arithmetic with a vector or a 1D array applies it to every row elementwise,
+whatever the number of rows. Scaling each row by its own scalar takes an
+(N, 1) column or scale_rows().
+'''
+class VectorArray:
+    DIM = None # dimension of each row, None allows any
+    ROW_TYPE = Vector # vector type returned for single rows
+
+    def __init__(self, data):
+        try:
+            arr = np.array(data, dtype=float)
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid numeric data')
+
+        if arr.ndim != 2:
+            raise ValueError(f'Expected 2 array dimensions, got {arr.ndim}')
+        if self.DIM is not None and arr.shape[1] != self.DIM:
+            raise ValueError(f'Only {self.DIM} dimensions are allowed')
+
+        self.data = arr
+
+    '''
+    Wraps an existing (N, d) array without validating or copying it
+    '''
+    @classmethod
+    def view(cls, data):
+        arr = cls.__new__(cls)
+        arr.data = data
+        return arr
+
+    @classmethod
+    def zeros(cls, n, dim=None):
+        dim = dim or cls.DIM
+        if dim is None:
+            raise ValueError(f'{cls.__name__} has no fixed dimension, dim is required')
+        return cls.view(np.zeros((n, dim)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        for row in self.data:
+            yield self.ROW_TYPE.view(row)
+
+    def __getitem__(self, key):
+        rows = self.data[key]
+        if rows.ndim == 1:
+            return self.ROW_TYPE.view(rows)
+        return type(self).view(rows)
+
+    def __setitem__(self, key, value):
+        self.data[key] = self._operand(value)
+
+    def __str__(self):
+        return str(self.data)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.data!r})'
+
+    def _operand(self, other):
+        if isinstance(other, (VectorArray, Vector)):
+            return other.data
+        elif isinstance(other, Number):
+            return other
+        elif isinstance(other, FastVector3D):
+            return other.XYZ
+        try:
+            return np.asarray(other, dtype=float)
+        except (TypeError, ValueError) as e:
+            raise TypeError("Other must be a scalar, vector "
+                            "or array of same length")
+
+    '''
+    Returns addition of each row with a scalar, vector or array of same shape
+    '''
+    def __add__(self, other):
+        return type(self).view(self.data + self._operand(other))
+
+    '''
+    Returns subtraction of a scalar, vector or array of same shape from each row
+    '''
+    def __sub__(self, other):
+        return type(self).view(self.data - self._operand(other))
+
+    def __neg__(self):
+        return type(self).view(-self.data)
+
+    '''
+    Returns scalar or elementwise multiplication of each row
+    '''
+    def __mul__(self, other):
+        return type(self).view(self.data * self._operand(other))
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    '''
+    Returns scalar or elementwise division of each row
+    '''
+    def __truediv__(self, other):
+        return type(self).view(self.data / self._operand(other))
+
+    def __iadd__(self, other):
+        self.data += self._operand(other)
+        return self
+
+    def __isub__(self, other):
+        self.data -= self._operand(other)
+        return self
+
+    def __imul__(self, other):
+        self.data *= self._operand(other)
+        return self
+
+    def __itruediv__(self, other):
+        self.data /= self._operand(other)
+        return self
+
+    '''
+    Scales every row in place to unit length. Zero rows are left as they are.
+    '''
+    def normalize_(self):
+        norms = self.norms()[:, np.newaxis]
+        np.divide(self.data, norms, out=self.data, where=norms > 0)
+        return self
+
+    '''
+    Rescales every row in place so its norm lies between low and high.
+    Zero rows are left as they are.
+    '''
+    def clamp_norm_(self, low, high):
+        norms = self.norms()
+        clamped = np.clip(norms, low, high)
+        np.divide(clamped, norms, out=clamped, where=norms > 0)
+        self.data *= clamped[:, np.newaxis]
+        return self
+
+    '''
+    Scales each row in place by its own scalar in k, of length N
+    '''
+    def scale_rows_(self, k):
+        self.data *= self._row_scalars(k)
+        return self
+
+    '''
+    Clamps each component in place between low and high
+    '''
+    def clip_(self, low, high):
+        np.clip(self.data, self._operand(low), self._operand(high), out=self.data)
+        return self
+
+    '''
+    Adds k times other to every row in place, where k may be a scalar or one
+    scalar per row
+    '''
+    def add_scaled_(self, other, k):
+        if isinstance(k, np.ndarray) and k.ndim == 1:
+            k = k[:, np.newaxis]
+        self.data += k * self._operand(other)
+        return self
+
+    '''
+    Returns the row-wise dot product with a vector or array of same shape
+    '''
+    def dot(self, other):
+        other = np.broadcast_to(self._operand(other), self.data.shape)
+        return np.einsum('ij,ij->i', self.data, other)
+
+    '''
+    Returns the H2 norm of every row
+    '''
+    def norms(self):
+        return np.sqrt(np.einsum('ij,ij->i', self.data, self.data))
+
+    def __abs__(self):
+        return self.norms()
+
+    '''
+    Returns a copy with each component clamped between low and high, which
+    may be scalars or vectors
+    '''
+    def clip(self, low, high):
+        return type(self).view(np.clip(self.data, self._operand(low),
+                                       self._operand(high)))
+
+    '''
+    Returns a copy with each row scaled by its own scalar in k, of length N
+    '''
+    def scale_rows(self, k):
+        return type(self).view(self.data * self._row_scalars(k))
+
+    def _row_scalars(self, k):
+        k = np.asarray(k, dtype=float)
+        if k.shape != (len(self.data),):
+            raise ValueError(f'Expected {len(self.data)} row scalars, got shape {k.shape}')
+        return k[:, np.newaxis]
+
+    '''
+    Returns a copy with each row rescaled so its norm lies between low and
+    high. Zero rows are left as they are.
+    '''
+    def clamp_norm(self, low, high):
+        norms = self.norms()
+        clamped = np.clip(norms, low, high)
+        scale = np.divide(clamped, norms, out=np.ones_like(norms), where=norms > 0)
+        return type(self).view(self.data * scale[:, np.newaxis])
+
+    '''
+    Returns a deep copy of the array
+    '''
+    def copy(self):
+        return type(self).view(self.data.copy())
+
+
+'''
+Implements an array of 2-dimensional vectors of real numbers.
+'''
+class Vector2DArray(VectorArray):
+    DIM = 2
+    ROW_TYPE = Vector2D
+
+    @property
+    def X(self):
+        return self.data[:, 0]
+
+    @property
+    def Y(self):
+        return self.data[:, 1]
+
+    '''
+    Returns the angle of each row, measured as 0 radians from x-axis, in radians
+    '''
+    def angle(self):
+        x, y = self.X, self.Y
+        angles = np.arctan2(y, x)
+        # match Vector2D.angle for zero vectors
+        return np.where((x == 0) & (y == 0), -math.pi/2, angles)
+
+    '''
+    Creates an array of vectors from angles and lengths (scalars or arrays)
+    '''
+    @staticmethod
+    def create_from_angle(angle, length):
+        angle, length = np.broadcast_arrays(angle, length)
+        return Vector2DArray.view(np.stack([length * np.cos(angle),
+                                            length * np.sin(angle)], axis=-1))
+
+    '''
+    Finds the angle of each row of v w.r.t the same row of u, with the same
+    sign convention as Vector2D.angle_between. 0 is returned for zero vectors.
+    '''
+    @staticmethod
+    def angle_between(u, v):
+        u = np.broadcast_to(u.data, np.broadcast_shapes(u.data.shape, v.data.shape))
+        v = np.broadcast_to(v.data, u.shape)
+        cross = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+        dot = np.einsum('ij,ij->i', u, v)
+        return np.arctan2(cross, dot)
+
+
+'''
+Implements an array of 3-dimensional vectors of real numbers.
+'''
+class Vector3DArray(VectorArray):
+    DIM = 3
+    ROW_TYPE = Vector3D
+
+    @property
+    def X(self):
+        return self.data[:, 0]
+
+    @property
+    def Y(self):
+        return self.data[:, 1]
+
+    @property
+    def Z(self):
+        return self.data[:, 2]
+
+    '''
+    Returns the row-wise cross product with a vector or array of same shape
+    '''
+    def cross(self, other):
+        return Vector3DArray.view(np.cross(self.data, self._operand(other)))
+
+    '''
+    Finds the unsigned angle between matching rows of u and v, from 0 to pi.
+    0 is returned for zero vectors.
+    '''
+    @staticmethod
+    def angle_between(u, v):
+        cross = np.cross(u.data, v.data)
+        dot = np.einsum('ij,ij->i', *np.broadcast_arrays(u.data, v.data))
+        return np.arctan2(np.sqrt(np.einsum('ij,ij->i', cross, cross)), dot)
+
+    '''
+    Gets spherical coordinates (physics standard) for every row, as arrays
+
+    r: radial distance from origin
+    theta: polar angle (0 to pi), where theta=0 in z-axis
+    phi: azimuthal angle (0 to 2pi), where phi=0 in x-axis
+    '''
+    def getSphericalCoords(self):
+        r = self.norms()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            theta = np.arccos(self.Z / r)
+        phi = np.arctan2(self.Y, self.X)
+        return (r, theta, phi)
+
+    '''
+    Gets cylindrical coordinates for every row, as arrays
+
+    s: radial distance from origin
+    phi: azimuthal angle (0 to 2pi), where phi=0 in x-axis
+    z: height from origin
+    '''
+    def getCylindricalCoords(self):
+        s = np.hypot(self.X, self.Y)
+        phi = np.arctan2(self.Y, self.X)
+        return (s, phi, self.Z.copy())
+
+    '''
+    Creates an array of 3D vectors from spherical coordinates (scalars or arrays)
+    '''
+    @staticmethod
+    def createSpherical(r, theta, phi):
+        r, theta, phi = np.broadcast_arrays(r, theta, phi)
+        return Vector3DArray.view(np.stack([r*np.sin(theta)*np.cos(phi),
+                                            r*np.sin(theta)*np.sin(phi),
+                                            r*np.cos(theta)], axis=-1))
+
+    '''
+    Creates an array of 3D vectors from cylindrical coordinates (scalars or arrays)
+    '''
+    @staticmethod
+    def createCylindrical(s, phi, z):
+        s, phi, z = np.broadcast_arrays(s, phi, z)
+        return Vector3DArray.view(np.stack([s*np.cos(phi), s*np.sin(phi),
+                                            z.astype(float)], axis=-1))
@@ -1,12 +1,21 @@
 import pygame
 from scenes import *
+from timing import FixedTimestep
+from profiling import Profiler
 
-pygame.init()
 
-
-def run_game(width, height, fps, starting_scene):
+# Each frame is timed into the profiler in the phases 'events', 'update' and
+# 'render' (which includes the scene's own 'flip'), and 'frame' for all of it
+def run_game(width, height, fps, starting_scene, substeps=1, profiler=None):
     screen = pygame.display.set_mode((width, height))
     clock = pygame.time.Clock()
+    timestep = FixedTimestep(fps, substeps)
+    if profiler is None:
+        profiler = Profiler()
+    frame_phase = profiler.phase('frame')
+    events_phase = profiler.phase('events')
+    update_phase = profiler.phase('update')
+    render_phase = profiler.phase('render')
 
     active_scene = starting_scene
     paused = None
@@ -14,17 +23,34 @@ def run_game(width, height, fps, starting_scene):
     while active_scene:
 
         if not active_scene.initialized:
+            active_scene.profiler = profiler
             active_scene.initGraphics(screen)
             active_scene.initialized = True
 
+        if active_scene.idle and not active_scene.redraw:
+            # nothing changes until an event arrives, so sleep until then
+            timeout = active_scene.IdleTimeout()
+            event = pygame.event.wait(timeout or 0) # 0 waits forever
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events += pygame.event.get()
+        else:
+            events = pygame.event.get()
+
+        frame_phase.start()
+        events_phase.start()
         pressed_keys = pygame.key.get_pressed()
 
         # Event filtering
         filtered_events = []
-        for event in pygame.event.get():
+        for event in events:
             quit_attempt = False
             if event.type == pygame.QUIT:
                 quit_attempt = True
+            elif event.type == pygame.VIDEORESIZE:
+                SceneBase.RefreshDisplayInfo(event.size)
+                active_scene.redraw = True
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                active_scene.redraw = True
             elif event.type == pygame.KEYDOWN:
                 alt_pressed = pressed_keys[pygame.K_LALT] or \
                               pressed_keys[pygame.K_RALT]
@@ -39,6 +65,7 @@ def run_game(width, height, fps, starting_scene):
                     active_scene.SwitchToScene(paused)
                     paused.next = paused
                 elif isinstance(active_scene, Pause):
+                    active_scene.paused.Close()
                     active_scene.next = Start()
                 else:
                     active_scene.Terminate()
@@ -46,15 +73,34 @@ def run_game(width, height, fps, starting_scene):
                 filtered_events.append(event)
 
         active_scene.ProcessInput(filtered_events, pressed_keys)
-        active_scene.Update()
-        active_scene.Render()
+        events_phase.stop()
+
+        if active_scene.FIXED_TIMESTEP:
+            steps, render = timestep.advance()
+            for _ in range(steps):
+                with update_phase:
+                    active_scene.Update(timestep.dt)
+            active_scene.interpolation = timestep.alpha
+        else:
+            # don't make the simulation catch up on time spent in menus
+            timestep.reset()
+            with update_phase:
+                active_scene.Update()
+            render = True
+        if render and (active_scene.redraw or not active_scene.idle):
+            with render_phase:
+                active_scene.Render()
+            active_scene.redraw = False
+        frame_phase.stop()
 
         active_scene = active_scene.next
 
-        pygame.display.flip()
+        # scenes present their own frames in Render
         clock.tick(fps)
 
 #==============================================================================
 # The rest is code where you implement your game using the Scenes model
 
-run_game(1280, 720, 60, Start())
\ No newline at end of file
+if __name__ == '__main__':
+    pygame.init()
+    run_game(1280, 720, 60, Start())
\ No newline at end of file
@@ -0,0 +1,225 @@
+import argparse
+import sys
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+import spatial
+from flock import FlockState
+
+'''
+A FlockState whose buffers live in shared memory and whose steps are split
+into chunks of rows computed by a pool of worker processes.
+
+Workers attach to the shared buffers once when the pool starts, so a step
+only sends each worker the frame number, the front buffer, its rows and dt.
+Since FlockState is double-buffered and per-row results do not depend on how
+rows are chunked, a step gives bit-identical results to FlockState.step.
+compare() checks that for every spatial index.
+
+Each worker builds its own copy of the spatial index, except for SHARED
+indexes, whose build carries state from one step to the next or is most of
+the neighbor search: those are built once per step here and their arrays
+copied into a second shared memory block the workers query from.
+
+Call close() (or use it as a context manager) to stop the workers and free
+the shared memory.
+'''
+class ParallelFlockState(FlockState):
+  def __init__(self, n, bounds, rng=None, neighbors='grid', params=None, workers=None, chunks=None,
+               spawn='uniform'):
+    FlockState.__init__(self, n, bounds, rng, neighbors, params=params, spawn=spawn)
+
+    self.workers = workers or multiprocessing.cpu_count()
+    self.chunks = chunks or self.workers
+    edges = np.linspace(0, n, self.chunks + 1).astype(int)
+    self.chunk_rows = [slice(lo, hi) for (lo, hi) in zip(edges[:-1], edges[1:])
+                       if hi > lo]
+    self.frame = 0
+
+    # move the state into shared memory
+    self.memory = shared_memory.SharedMemory(create=True, size=_shared_size(n))
+    self.index_memory = None # holds the arrays of a SHARED index, see publish()
+    for name, array in _shared_arrays(self.memory, n).items():
+      array[...] = getattr(self, name)
+      setattr(self, name, array)
+
+    self.pool = None
+    if self.workers > 1:
+      self.pool = multiprocessing.Pool(self.workers, initializer=_attach,
+                                       initargs=(self.memory.name, n, self.bounds,
+                                                 type(self), self.index, self.params))
+
+  def step(self, dt=1.0):
+    layout = None
+    if self.pool is None or self.index.SHARED:
+      self.index.build(self.positions)
+      if self.pool is not None:
+        layout = self.publish(self.index.shared())
+    tasks = [(self.frame, self.current, rows.start, rows.stop, dt, layout)
+             for rows in self.chunk_rows]
+    if self.pool is None:
+      for (_, _, lo, hi, _, _) in tasks:
+        self.fly_with_flock(slice(lo, hi))
+        self.update_rows(slice(lo, hi), dt)
+    else:
+      self.pool.starmap(_step_chunk, tasks)
+    self.frame += 1
+    self.swap()
+
+  '''
+  Copies the arrays of a built index into the index memory, growing it when
+  they don't fit, and returns the memory's name and where each array is in it
+  '''
+  def publish(self, arrays):
+    layout = []
+    size = 0
+    for name, array in arrays.items():
+      layout.append((name, array.shape, array.dtype.str, size))
+      size += -(-array.nbytes // 8) * 8 # keep every array 8-byte aligned
+    if self.index_memory is None or self.index_memory.size < size:
+      self._free_index_memory()
+      # leave room to grow, the Verlet candidates change size with every rebuild
+      self.index_memory = shared_memory.SharedMemory(create=True, size=max(1, 2 * size))
+    for (name, shape, dtype, offset) in layout:
+      np.ndarray(shape, dtype, buffer=self.index_memory.buf, offset=offset)[...] = arrays[name]
+    return self.index_memory.name, layout
+
+  def _free_index_memory(self):
+    if self.index_memory is not None:
+      self.index_memory.close()
+      self.index_memory.unlink()
+      self.index_memory = None
+
+  def close(self):
+    if self.pool is not None:
+      self.pool.terminate()
+      self.pool.join()
+      self.pool = None
+    if self.memory is not None:
+      # drop our views before releasing the buffer they point into
+      for name in _SHARED_LAYOUT:
+        setattr(self, name, getattr(self, name).copy())
+      self.memory.close()
+      self.memory.unlink()
+      self.memory = None
+    self._free_index_memory()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+# name, shape (given N) and dtype of each shared array
+_SHARED_LAYOUT = {
+  'position_buffers': (lambda n: (2, n, 3), np.float64),
+  'velocity_buffers': (lambda n: (2, n, 3), np.float64),
+  'closeness': (lambda n: (n, 3), np.float64),
+  'avg_velocity': (lambda n: (n, 3), np.float64),
+  'avg_position': (lambda n: (n, 3), np.float64),
+  'num_neighbors': (lambda n: (n,), np.int64),
+}
+
+def _shared_size(n):
+  return max(1, sum(int(np.prod(shape(n))) * np.dtype(dtype).itemsize
+                    for (shape, dtype) in _SHARED_LAYOUT.values()))
+
+def _shared_arrays(memory, n):
+  arrays = {}
+  offset = 0
+  for name, (shape, dtype) in _SHARED_LAYOUT.items():
+    array = np.ndarray(shape(n), dtype=dtype, buffer=memory.buf, offset=offset)
+    offset += array.nbytes
+    arrays[name] = array
+  return arrays
+
+
+# state of each worker process, set up once by _attach
+_worker = None
+_memory = None
+_index_memory = None
+_built_frame = None
+
+def _attach(name, n, bounds, state_type, index, params):
+  global _worker, _memory
+  _memory = shared_memory.SharedMemory(name=name)
+  _worker = FlockState.__new__(state_type)
+  FlockState.__init__(_worker, n, bounds, neighbors=index, params=params)
+  for name, array in _shared_arrays(_memory, n).items():
+    setattr(_worker, name, array)
+
+def _attach_index(name, layout):
+  global _index_memory
+  previous = None
+  if _index_memory is None or _index_memory.name != name:
+    previous, _index_memory = _index_memory, shared_memory.SharedMemory(name=name)
+  arrays = {array: np.ndarray(shape, dtype, buffer=_index_memory.buf, offset=offset)
+            for (array, shape, dtype, offset) in layout}
+  _worker.index.attach(_worker.positions, arrays)
+  # the index no longer points into the old block
+  if previous is not None:
+    previous.close()
+
+def _step_chunk(frame, current, lo, hi, dt, layout):
+  global _built_frame
+  _worker.current = current
+  if _built_frame != frame:
+    if layout is None:
+      _worker.index.build(_worker.positions)
+    else:
+      _attach_index(*layout)
+    _built_frame = frame
+  rows = slice(lo, hi)
+  _worker.fly_with_flock(rows)
+  _worker.update_rows(rows, dt)
+
+
+BOUNDS = [(0, 1280), (0, 720), (0, 255)]
+
+'''
+Steps a ParallelFlockState and a FlockState spawned from the same seed side
+by side, with every spatial index, and returns the largest difference
+between their positions by index name. Anything but 0 breaks the
+bit-identical guarantee.
+'''
+def compare(n=3000, steps=90, workers=8, chunks=3, seed=0, indexes=None):
+  differences = {}
+  for neighbors in indexes or sorted(spatial.INDEXES):
+    if neighbors == 'kdtree' and spatial.cKDTree is None:
+      continue
+    serial = FlockState(n, BOUNDS, np.random.default_rng(seed), neighbors)
+    with ParallelFlockState(n, BOUNDS, np.random.default_rng(seed), neighbors,
+                            workers=workers, chunks=chunks) as parallel:
+      difference = 0.0
+      for _ in range(steps):
+        serial.step()
+        parallel.step()
+        difference = max(difference, np.max(np.abs(serial.positions - parallel.positions)),
+                         np.max(np.abs(serial.velocities - parallel.velocities)))
+    differences[neighbors] = difference
+  return differences
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Check that parallel steps match serial ones')
+  parser.add_argument('-n', '--boids', type=int, default=3000)
+  parser.add_argument('--steps', type=int, default=90)
+  parser.add_argument('--workers', type=int, default=8)
+  parser.add_argument('--chunks', type=int, default=3)
+  parser.add_argument('--neighbors', nargs='*', help='indexes to check, all of them by default')
+  args = parser.parse_args()
+
+  differences = compare(args.boids, args.steps, args.workers, args.chunks,
+                        indexes=args.neighbors)
+  for neighbors, difference in differences.items():
+    print(f'{neighbors:<8}{difference:>12g}', flush=True)
+  failed = [neighbors for (neighbors, difference) in differences.items() if difference != 0]
+  if failed:
+    print(f'parallel steps differ from serial ones with {", ".join(failed)}')
+    sys.exit(1)
+  print('parallel steps match serial ones')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,167 @@
+import csv
+import json
+import time
+import numpy as np
+
+'''
+Fixed-size buffer of the latest samples. Appending overwrites the oldest
+sample once full, so recording never allocates.
+'''
+class RingBuffer:
+  def __init__(self, size):
+    self.data = np.zeros(size)
+    self.index = 0
+    self.count = 0
+
+  def __len__(self):
+    return self.count
+
+  def append(self, value):
+    self.data[self.index] = value
+    self.index = (self.index + 1) % len(self.data)
+    if self.count < len(self.data):
+      self.count += 1
+
+  '''
+  Returns the samples from oldest to newest
+  '''
+  def values(self):
+    if self.count < len(self.data):
+      return self.data[:self.count].copy()
+    return np.roll(self.data, -self.index)
+
+
+'''
+Context manager timing one phase into its RingBuffer. Profiler keeps one per
+phase name, so timing a phase does not allocate either.
+'''
+class Phase:
+  __slots__ = ('samples', 'started')
+
+  def __init__(self, size):
+    self.samples = RingBuffer(size)
+    self.started = 0.0
+
+  def start(self):
+    self.started = time.perf_counter()
+
+  def stop(self):
+    self.samples.append(time.perf_counter() - self.started)
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *exc):
+    self.stop()
+
+
+'''
+Collects how long each named phase of a frame takes, e.g.
+
+  with profiler.phase('render'):
+    scene.Render()
+
+and reports rolling percentiles over the last size samples of every phase.
+Phases are created on first use and keep the order they were first seen in.
+Times are stored in seconds and reported in milliseconds.
+'''
+class Profiler:
+  PERCENTILES = (50, 95, 99)
+
+  def __init__(self, size=600):
+    self.size = size
+    self.phases = {}
+
+  def phase(self, name):
+    phase = self.phases.get(name)
+    if phase is None:
+      phase = self.phases[name] = Phase(self.size)
+    return phase
+
+  def record(self, name, seconds):
+    self.phase(name).samples.append(seconds)
+
+  def reset(self):
+    self.phases.clear()
+
+  '''
+  Returns {phase: {'count', 'mean', 'p50', 'p95', 'p99', 'max'}} in ms
+  '''
+  def summary(self):
+    summary = {}
+    for name, phase in self.phases.items():
+      values = phase.samples.values() * 1000
+      if len(values) == 0:
+        continue
+      stats = {'count': len(values), 'mean': float(values.mean())}
+      for q, value in zip(self.PERCENTILES, np.percentile(values, self.PERCENTILES)):
+        stats[f'p{q}'] = float(value)
+      stats['max'] = float(values.max())
+      summary[name] = stats
+    return summary
+
+  '''
+  Returns the summary as lines of text, for an on-screen overlay
+  '''
+  def lines(self):
+    header = f"{'ms':<12}" + ''.join(f'{f"p{q}":>7}' for q in self.PERCENTILES)
+    lines = [header]
+    for name, stats in self.summary().items():
+      lines.append(f'{name:<12}' + ''.join(f'{stats[f"p{q}"]:7.2f}'
+                                             for q in self.PERCENTILES))
+    return lines
+
+  '''
+  Writes the summary to a .csv file, one row per phase, or the summary and
+  every buffered sample to a .json file
+  '''
+  def export(self, path):
+    summary = self.summary()
+    if str(path).endswith('.csv'):
+      fields = ['phase', 'count', 'mean'] + [f'p{q}' for q in self.PERCENTILES] + ['max']
+      with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        for name, stats in summary.items():
+          writer.writerow({'phase': name, **stats})
+    else:
+      samples = {name: (phase.samples.values() * 1000).tolist()
+                 for name, phase in self.phases.items()}
+      with open(path, 'w') as file:
+        json.dump({'unit': 'ms', 'summary': summary, 'samples': samples}, file, indent=2)
+
+
+'''
+Stands in for a Profiler when profiling is off, at the cost of a method call
+'''
+class NullProfiler:
+  class NullPhase:
+    def start(self):
+      pass
+
+    def stop(self):
+      pass
+
+    def __enter__(self):
+      return self
+
+    def __exit__(self, *exc):
+      pass
+
+  PHASE = NullPhase()
+
+  def phase(self, name):
+    return self.PHASE
+
+  def record(self, name, seconds):
+    pass
+
+  def summary(self):
+    return {}
+
+  def lines(self):
+    return []
+
+
+NULL = NullProfiler()
@@ -0,0 +1,163 @@
+import json
+import struct
+import numpy as np
+
+'''
+Trajectory files: every frame's positions and velocities, laid out as one
+(frames, 2, N, 3) array after a small header, so they can be memory-mapped
+for writing and reading alike.
+
+  offset 0   MAGIC
+  offset 8   uint32 length of the JSON header
+  offset 16  uint64 number of frames recorded so far
+  offset 24  JSON header: n, capacity, dtype, bounds, params, scale, offset
+  then       frame data, starting at the next multiple of ALIGNMENT
+
+Frames are stored as float32, or as int16 quantized over the area for
+positions and over +-MAX_SPEED for velocities. Either way a stored value q
+decodes to q * scale + offset, per channel (0 positions, 1 velocities) and
+axis.
+'''
+MAGIC = b'BOIDTRAJ'
+ALIGNMENT = 64
+DTYPES = ('float32', 'int16')
+_PREFIX = struct.Struct('<8sI4xQ')
+_COUNT_OFFSET = 16
+
+
+'''
+Streams a flock's frames into a preallocated, memory-mapped trajectory file.
+
+Every frame is converted straight into the mapped file from the state's
+arrays, through a preallocated scratch buffer for int16, so recording makes
+no temporary arrays. Recording more than capacity frames raises ValueError.
+
+path: file to create, overwritten if it exists
+state: the FlockState to record, read for its size, bounds and params
+capacity: number of frames to make room for
+dtype: 'float32' or 'int16'
+'''
+class TrajectoryRecorder:
+  def __init__(self, path, state, capacity, dtype='float32'):
+    if dtype not in DTYPES:
+      raise ValueError(f'Unknown trajectory dtype {dtype!r}, expected one of {DTYPES}')
+    self.path = path
+    self.n = len(state)
+    self.capacity = capacity
+    self.dtype = np.dtype(dtype)
+
+    bounds = np.asarray(state.bounds, dtype=float)
+    offset = np.zeros((2, 3))
+    scale = np.ones((2, 3))
+    if dtype == 'int16':
+      limit = np.iinfo(np.int16).max
+      offset[0] = bounds.mean(axis=1)
+      scale[0] = np.maximum(bounds[:, 1] - bounds[:, 0], 1e-9) / 2 / limit
+      scale[1] = state.MAX_SPEED / limit
+    self.offset = offset
+    self.scale = scale
+
+    header = json.dumps({
+      'n': self.n,
+      'capacity': capacity,
+      'dtype': dtype,
+      'bounds': bounds.tolist(),
+      'params': {name: float(value) for name, value in state.params.items()},
+      'scale': scale.tolist(),
+      'offset': offset.tolist(),
+    }).encode()
+    start = _PREFIX.size + len(header)
+    self.data_offset = -(-start // ALIGNMENT) * ALIGNMENT
+    frame_bytes = 2 * self.n * 3 * self.dtype.itemsize
+
+    with open(path, 'wb') as file:
+      file.write(_PREFIX.pack(MAGIC, len(header), 0))
+      file.write(header)
+      file.truncate(self.data_offset + capacity * frame_bytes)
+
+    self.file = np.memmap(path, dtype=np.uint8, mode='r+')
+    self.count = self.file[_COUNT_OFFSET:_COUNT_OFFSET + 8].view('<u8')
+    self.frames = self.file[self.data_offset:].view(self.dtype).reshape(capacity, 2, self.n, 3)
+    self.recorded = 0
+    self.scratch = np.empty((self.n, 3))
+    self.inverse_scale = 1 / scale
+
+  def write(self, state):
+    if self.recorded >= self.capacity:
+      raise ValueError(f'Trajectory {self.path} is full at {self.capacity} frames')
+    frame = self.frames[self.recorded]
+    self.encode(state.positions, 0, frame[0])
+    self.encode(state.velocities, 1, frame[1])
+    self.recorded += 1
+    self.count[0] = self.recorded
+
+  def encode(self, values, channel, out):
+    if self.dtype == np.float32:
+      np.copyto(out, values, casting='same_kind')
+      return
+    scratch = self.scratch
+    np.subtract(values, self.offset[channel], out=scratch)
+    scratch *= self.inverse_scale[channel]
+    np.rint(scratch, out=scratch)
+    np.clip(scratch, -32767, 32767, out=scratch)
+    np.copyto(out, scratch, casting='unsafe')
+
+  def close(self):
+    if self.file is not None:
+      self.file.flush()
+      self.frames = self.count = None
+      self.file = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+'''
+Reads a trajectory file without loading it: frames are memory-mapped, so
+slicing any range of a multi-GB recording only touches those frames.
+
+raw holds the stored (frames, 2, N, 3) values. positions() and velocities()
+decode a range of frames to floats, which for float32 files is a zero-copy
+view of the mapped file.
+'''
+class Trajectory:
+  def __init__(self, path):
+    with open(path, 'rb') as file:
+      magic, length, recorded = _PREFIX.unpack(file.read(_PREFIX.size))
+      if magic != MAGIC:
+        raise ValueError(f'{path} is not a trajectory file')
+      self.header = json.loads(file.read(length))
+
+    self.path = path
+    self.n = self.header['n']
+    self.dtype = np.dtype(self.header['dtype'])
+    self.bounds = np.array(self.header['bounds'])
+    self.params = self.header['params']
+    self.scale = np.array(self.header['scale'])
+    self.offset = np.array(self.header['offset'])
+
+    data_offset = -(-(_PREFIX.size + length) // ALIGNMENT) * ALIGNMENT
+    mapped = np.memmap(path, dtype=self.dtype, mode='r', offset=data_offset,
+                       shape=(self.header['capacity'], 2, self.n, 3))
+    self.raw = mapped[:recorded]
+
+  def __len__(self):
+    return len(self.raw)
+
+  def decode(self, channel, frames=slice(None)):
+    values = self.raw[frames, channel]
+    if self.dtype == np.float32:
+      return values
+    return values * self.scale[channel] + self.offset[channel]
+
+  '''
+  Returns the positions of the given frames, a slice or an index
+  '''
+  def positions(self, frames=slice(None)):
+    return self.decode(0, frames)
+
+  def velocities(self, frames=slice(None)):
+    return self.decode(1, frames)
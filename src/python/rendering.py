@@ -0,0 +1,181 @@
+import pygame
+import numpy as np
+import math
+import itertools
+import colors
+
+'''
+Pre-renders the boid sprite once for every alpha level and heading, so
+drawing a boid is a lookup plus a blit with no per-frame surface writes.
+
+shape: 'square', 'circle' or 'triangle' (pointing along the boid's heading)
+size: width and height of each sprite in pixels
+color: an RGB tuple or the name of a color in colors.py, e.g. 'GOLD'
+levels: number of alpha levels, from 2 to 256; alphas are rounded to the
+nearest level
+headings: number of headings to pre-render rotated sprites for; only
+useful for shapes that are not symmetric, like 'triangle'
+
+All sprites are subsurfaces of one atlas surface, with a row per heading and
+a column per alpha level.
+'''
+class SpriteAtlas:
+  SHAPES = ('square', 'circle', 'triangle')
+
+  def __init__(self, shape='square', size=5, color=colors.WHITE, levels=256, headings=1):
+    if shape not in self.SHAPES:
+      raise ValueError(f'Unknown boid shape {shape!r}, expected one of {self.SHAPES}')
+    if not 2 <= levels <= 256:
+      raise ValueError('Alpha levels must be between 2 and 256')
+    if isinstance(color, str):
+      color = getattr(colors, color.upper())
+
+    self.shape = shape
+    self.size = size
+    self.color = tuple(color[:3])
+    self.levels = levels
+    self.headings = headings
+
+    self.alphas = np.linspace(0, 255, levels).round().astype(int)
+    # nearest level of every alpha from 0 to 255
+    self.lookup = np.rint(np.arange(256) * (levels - 1) / 255).astype(np.intp)
+
+    self.surface = pygame.Surface([levels * size, headings * size], flags=pygame.SRCALPHA)
+    self.surface.fill(colors.TRANSPARENT)
+    self.sprites = []
+    for heading in range(headings):
+      angle = 2 * math.pi * heading / headings
+      for level, alpha in enumerate(self.alphas.tolist()):
+        sprite = self.surface.subsurface([level * size, heading * size, size, size])
+        self.render(sprite, (*self.color, alpha), angle)
+        self.sprites.append(sprite)
+
+    # pixel offsets covered by the unrotated shape, from its top-left corner
+    mask = pygame.surfarray.array_alpha(self.sprites[levels - 1]) > 0
+    self.offsets = np.argwhere(mask)
+
+  def render(self, surface, color, angle):
+    size = self.size
+    if self.shape == 'square':
+      surface.fill(color)
+    elif self.shape == 'circle':
+      pygame.draw.circle(surface, color, (size / 2, size / 2), size / 2)
+    else:
+      center = (size - 1) / 2
+      points = [(center + center * math.cos(angle + da),
+                 center + center * math.sin(angle + da))
+                for da in (0, 2.5, -2.5)]
+      pygame.draw.polygon(surface, color, points)
+
+  '''
+  Returns the index into self.sprites for each alpha and heading angle
+  '''
+  def index(self, alphas, angles=None):
+    levels = self.lookup[alphas]
+    if angles is None or self.headings == 1:
+      return levels
+    headings = np.rint(angles * self.headings / (2 * math.pi)).astype(np.intp) % self.headings
+    return headings * self.levels + levels
+
+
+'''
+Draws a whole flock in one pass from its position array, instead of filling
+and blitting one Surface per boid.
+
+Each boid is a sprite from a SpriteAtlas whose alpha is its depth (Z), like
+Boid. The default atlas draws 5x5 white squares, as Boid does.
+
+mode 'blits': blits the atlas sprites with a single Surface.blits (or fblits
+where available) call. Blends exactly like Boid.
+mode 'pixels': writes pixels straight into a surfarray view of the screen,
+keeping the brighter color where boids overlap. Only correct over an opaque
+background, which is how BoidsScene draws, and ignores headings.
+
+The renderer remembers where it last drew, so a frame can erase just those
+boxes and push only the changed rects to the display instead of a full flip.
+'''
+class FlockRenderer:
+  MODES = ('blits', 'pixels')
+
+  def __init__(self, atlas=None, mode='blits'):
+    if mode not in self.MODES:
+      raise ValueError(f'Unknown render mode {mode!r}, expected one of {self.MODES}')
+    self.atlas = atlas or SpriteAtlas()
+    self.mode = mode
+    self.corners = np.empty((0, 2), dtype=int) # top-left corners of the last draw
+    self.eraser = None
+
+  @property
+  def size(self):
+    return self.atlas.size
+
+  '''
+  Returns the top-left corner and alpha of every boid as integer arrays
+  '''
+  def place(self, positions):
+    corners = np.trunc(positions[:, :2] - self.size / 2).astype(int)
+    alphas = np.clip(positions[:, 2], 0, 255).astype(int)
+    return corners, alphas
+
+  def draw(self, screen, positions, velocities=None):
+    if self.mode == 'pixels':
+      self.draw_pixels(screen, positions)
+    else:
+      self.draw_blits(screen, positions, velocities)
+
+  '''
+  Returns the (x, y, w, h) boxes of the last draw, as a list for
+  pygame.display.update
+  '''
+  def rects(self):
+    sizes = np.full_like(self.corners, self.size)
+    return np.hstack([self.corners, sizes]).tolist()
+
+  '''
+  Fills the boxes of the last draw with the background color and returns them
+  '''
+  def erase(self, screen, color):
+    if self.eraser is None or self.eraser.get_at((0, 0))[:3] != tuple(color[:3]):
+      self.eraser = pygame.Surface([self.size, self.size])
+      self.eraser.fill(color)
+    sequence = zip(itertools.repeat(self.eraser), self.corners.tolist())
+    screen.blits(sequence, doreturn=False)
+    return self.rects()
+
+  def draw_blits(self, screen, positions, velocities=None):
+    corners, alphas = self.place(positions)
+    self.corners = corners
+    angles = None
+    if velocities is not None and self.atlas.headings > 1:
+      angles = np.arctan2(velocities[:, 1], velocities[:, 0])
+    sprites = self.atlas.sprites
+    sequence = zip([sprites[i] for i in self.atlas.index(alphas, angles).tolist()],
+                   corners.tolist())
+    if hasattr(screen, 'fblits'):
+      screen.fblits(sequence)
+    else:
+      screen.blits(sequence, doreturn=False)
+
+  def draw_pixels(self, screen, positions):
+    corners, alphas = self.place(positions)
+    self.corners = corners
+    width, height = screen.get_size()
+    offsets = self.atlas.offsets
+
+    # draw faintest first, so the brightest boid wins where they overlap
+    order = np.argsort(alphas, kind='stable')
+    corners = corners[order]
+    alphas = self.atlas.alphas[self.atlas.lookup[alphas[order]]]
+    shades = (np.outer(alphas, self.atlas.color) / 255).astype(np.uint8)
+
+    pixels = (corners[:, np.newaxis, :] + offsets).reshape(-1, 2)
+    shades = np.repeat(shades, len(offsets), axis=0)
+    inside = (pixels[:, 0] >= 0) & (pixels[:, 0] < width) \
+             & (pixels[:, 1] >= 0) & (pixels[:, 1] < height)
+    pixels, shades = pixels[inside], shades[inside]
+
+    view = pygame.surfarray.pixels3d(screen)
+    try:
+      view[pixels[:, 0], pixels[:, 1]] = shades
+    finally:
+      del view # unlocks the screen
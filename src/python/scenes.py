@@ -4,17 +4,45 @@ import numpy as np
 import time
 from linalg import Vector3D
 from boids import *
+from flock import FlockState
+from rendering import FlockRenderer, SpriteAtlas
+import profiling
 import utilities
 
 class SceneBase:
+    FIXED_TIMESTEP = False # step Update(dt) on a fixed timestep, see timing.FixedTimestep
+    # display size shared by every scene, cached instead of asking
+    # pygame.display.Info() each frame and refreshed on VIDEORESIZE
+    screenWidth = 0
+    screenHeight = 0
+
     def __init__(self):
         self.next = self
         self.initialized = False
+        self.interpolation = 1.0 # fraction of a fixed step to render ahead of the last state
+        self.profiler = profiling.NULL # run_game hands its Profiler to every scene
+        # an idle scene only changes on input or when it sets redraw, so
+        # run_game sleeps until an event arrives and skips Render otherwise
+        self.idle = False
+        self.redraw = True
 
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
         self.screen = screen
         self.initialized = True
+        SceneBase.RefreshDisplayInfo(screen.get_size())
+
+    @staticmethod
+    def RefreshDisplayInfo(size=None):
+        if size is None:
+            info = pygame.display.Info()
+            size = info.current_w, info.current_h
+        SceneBase.screenWidth, SceneBase.screenHeight = size
+
+    # longest an idle scene may sleep before Update must run again, in ms,
+    # or None to wait for input however long it takes
+    def IdleTimeout(self):
+        return None
 
     def ProcessInput(self, events, pressed_keys):
         print("uh-oh, you didn't override this in the child class")
@@ -31,6 +59,10 @@ class SceneBase:
     def Terminate(self):
         self.SwitchToScene(None)
 
+    # releases what the scene holds once it is left for good
+    def Close(self):
+        pass
+
 
 class Start(SceneBase):
     BUTTON_DELAY = 0.15
@@ -41,12 +73,12 @@ class Start(SceneBase):
         self.options = ['Boids', 'Quit']
         self.buttons = pygame.sprite.Group()
         self.startTime = time.time()
+        self.idle = True
 
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.screenWidth, self.screenHeight
 
         font = pygame.font.Font('freesansbold.ttf', 20)
 
@@ -71,9 +103,17 @@ class Start(SceneBase):
     def ProcessInput(self, events, pressed_keys):
         pass
 
+    def IdleTimeout(self):
+        # wake up once the buttons start responding
+        remaining = self.BUTTON_DELAY - (time.time() - self.startTime)
+        if remaining > 0:
+            return int(remaining * 1000) + 1
+        return None
+
     def Update(self):
         if time.time() - self.startTime > self.BUTTON_DELAY:
             self.buttons.update()
+            self.redraw |= any(button.changed for button in self.buttons)
 
     def Render(self):
         self.screen.fill(colors.WHITE)
@@ -86,8 +126,6 @@ class Button(pygame.sprite.Sprite):
         # Call the parent class (Sprite) constructor
         pygame.sprite.Sprite.__init__(self)
 
-        self.image = pygame.Surface((rect[2], rect[3]))
-
         self.rect = rect
 
         self.font = font
@@ -101,28 +139,40 @@ class Button(pygame.sprite.Sprite):
         self.passive_text = passive_text
         self.passive_textcolor = passive_textcolor
 
+        # both states are drawn once here, update only picks one
+        self.active_image = self.renderButton(active_color, active_text, active_textcolor)
+        self.passive_image = self.renderButton(passive_color, passive_text, passive_textcolor)
+        self.image = self.passive_image
+        self.changed = False # whether the last update switched images
+
     def update(self):
         mouseX, mouseY = pygame.mouse.get_pos()
         pressed = pygame.mouse.get_pressed()[0]
+        image = self.image
 
         if self.rect.x <= mouseX <= self.rect.x + self.rect.w \
                 and self.rect.y <= mouseY <= self.rect.y + self.rect.h:
-            self.image.fill(self.active_color)
-            self.renderButtonText(self.active_text, self.active_textcolor)
+            self.image = self.active_image
 
             if pressed:
                 self.action()
         else:
-            self.image.fill(self.passive_color)
-            self.renderButtonText(self.passive_text, self.passive_textcolor)
+            self.image = self.passive_image
+        self.changed = self.image is not image
+
+    def renderButton(self, color, text, textcolor):
+        image = pygame.Surface((self.rect[2], self.rect[3]))
+        image.fill(color)
+        self.renderButtonText(image, text, textcolor)
+        return image
 
-    def renderButtonText(self, text, color):
+    def renderButtonText(self, image, text, color):
         textsurf = self.font.render(text, True, color)
         textrect = textsurf.get_rect()
         # Put text in the middle of button
         textrect.left = self.rect.width/2 - textrect.width/2
         textrect.top = self.rect.height/2 - textrect.height/2
-        self.image.blit(textsurf, textrect)
+        image.blit(textsurf, textrect)
 
 
 class CheckExit(SceneBase):
@@ -132,6 +182,7 @@ class CheckExit(SceneBase):
         self.paused = paused
         self.options = ["Yes", "No"]
         self.buttons = pygame.sprite.Group()
+        self.idle = True
 
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
@@ -145,8 +196,11 @@ class CheckExit(SceneBase):
         self.warningText = pygame.font.SysFont('Arial', 25)
         font = pygame.font.Font('freesansbold.ttf', 20)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.screenWidth, self.screenHeight
+        self.promptSurf = self.warningText.render("Quit without saving?",
+                                                  True, (0, 0, 0))
+        self.promptRect = self.promptSurf.get_rect()
+        self.promptRect.center = screenWidth / 2, 50
 
         for i, option in enumerate(self.options):
             rect = pygame.Rect(int(screenWidth / 2) - 50,
@@ -157,6 +211,7 @@ class CheckExit(SceneBase):
 
             if i == 0:
                 def action():
+                    self.paused.Close()
                     self.SwitchToScene(Start())
             else:
                 def action():
@@ -172,15 +227,10 @@ class CheckExit(SceneBase):
 
     def Update(self):
         self.buttons.update()
+        self.redraw |= any(button.changed for button in self.buttons)
 
     def Render(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-        promptSurf = self.warningText.render("Quit without saving?",
-                                             True, (0, 0, 0))
-        promptRect = promptSurf.get_rect()
-        promptRect.center = screenWidth / 2, 50
-        self.screen.blit(promptSurf, promptRect)
+        self.screen.blit(self.promptSurf, self.promptRect)
 
         self.buttons.draw(self.screen)
         pygame.display.flip()
@@ -196,6 +246,7 @@ class Pause(SceneBase):
         self.paused = paused
         self.options = ["Resume", "Quit"]
         self.buttons = pygame.sprite.Group()
+        self.idle = True
 
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
@@ -209,8 +260,10 @@ class Pause(SceneBase):
         self.pauseText = pygame.font.SysFont('Arial', 25)
         font = pygame.font.Font('freesansbold.ttf', 20)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.screenWidth, self.screenHeight
+        self.promptSurf = self.pauseText.render("PAUSED", True, (0, 0, 0))
+        self.promptRect = self.promptSurf.get_rect()
+        self.promptRect.center = screenWidth/2, 50
 
         for i, option in enumerate(self.options):
             rect = pygame.Rect(int(screenWidth / 2) - 50,
@@ -224,6 +277,7 @@ class Pause(SceneBase):
                     self.paused.next = self.paused
             else:
                 def action():
+                    self.paused.Close()
                     self.SwitchToScene(Start())
 
             button = Button(rect, action, font, active_color, option, colors.WHITE, passive_color, option, colors.WHITE)
@@ -242,14 +296,10 @@ class Pause(SceneBase):
 
     def Update(self):
         self.buttons.update()
+        self.redraw |= any(button.changed for button in self.buttons)
 
     def Render(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-        promptSurf = self.pauseText.render("PAUSED", True, (0, 0, 0))
-        promptRect = promptSurf.get_rect()
-        promptRect.center = screenWidth/2, 50
-        self.screen.blit(promptSurf, promptRect)
+        self.screen.blit(self.promptSurf, self.promptRect)
 
         self.buttons.draw(self.screen)
         pygame.display.flip()
@@ -260,29 +310,58 @@ class Pause(SceneBase):
 
 class BoidsScene(SceneBase):
     N_BOIDS = 50 # number of Boids to simulate
+    SEED = None # seed for spawning the flock, None for a different flock every time
+    SPAWN = 'uniform' # where boids spawn: 'uniform', 'sphere' or 'clusters', see spawning.py
+    RENDER_MODE = 'blits' # how FlockRenderer draws the flock: 'blits' or 'pixels'
+    BOID_SHAPE = 'square' # 'square', 'circle' or 'triangle'
+    BOID_SIZE = 5
+    BOID_COLOR = colors.WHITE
+    ALPHA_LEVELS = 256 # number of depth shades pre-rendered in the sprite atlas
+    HEADINGS = 1 # number of pre-rendered headings, more for 'triangle'
+    DIRTY_RECTS = True # only redraw and push the boxes boids moved between
+    MAX_DIRTY_RECTS = 2000 # flip the whole screen instead past this many rects
+    FIXED_TIMESTEP = True
+    INTERPOLATE = True # render boids between fixed steps instead of at the last one
+    THREADED = False # step the flock on a background FlockThread instead of in Update
+    STEP_RATE = 60 # frames per second the FlockThread simulates
+    PROFILE_KEY = pygame.K_F3 # shows or hides the frame time overlay
+    PROFILE_INTERVAL = 0.25 # seconds between refreshes of the overlay
 
     def __init__(self):
         SceneBase.__init__(self)
         # initialize RNG
-        self.rng = np.random.default_rng()
-
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-
-        self.boids = pygame.sprite.Group()
-
-        for i in range(BoidsScene.N_BOIDS):
-            boid = Boid([(0, screenWidth),
-                         (0, screenHeight),
-                         (0, 255)]) # depth must be 255 at most for alpha to work correctly
-            self.boids.add(boid)
+        self.rng = np.random.default_rng(BoidsScene.SEED)
+        # a FlockThread keeps its own time, so the game loop must not step us
+        self.FIXED_TIMESTEP = not BoidsScene.THREADED
+        self.flock = None
 
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = screen.get_size()
+
+        state = FlockState(BoidsScene.N_BOIDS,
+                           [(0, screenWidth),
+                            (0, screenHeight),
+                            (0, 255)], # depth must be 255 at most for alpha to work correctly
+                           self.rng, spawn=BoidsScene.SPAWN)
+        state.profiler = self.profiler
+        # sprites for code that needs individual boids live in the flock, the
+        # boids themselves are drawn in one pass by the renderer
+        self.flock = Flock(state, BoidsScene.THREADED, BoidsScene.STEP_RATE)
+        atlas = SpriteAtlas(BoidsScene.BOID_SHAPE, BoidsScene.BOID_SIZE,
+                            BoidsScene.BOID_COLOR, BoidsScene.ALPHA_LEVELS,
+                            BoidsScene.HEADINGS)
+        self.renderer = FlockRenderer(atlas, BoidsScene.RENDER_MODE)
+        self.full_redraw = True # the screen holds something other than our last frame
+        self.display_positions = np.empty_like(state.positions)
+
+        self.showProfile = False
+        self.profileFont = pygame.font.SysFont('monospace', 14)
+        self.profileSurf = None
+        self.profileRect = pygame.Rect(0, 0, 0, 0)
+        self.profileTime = 0
 
     def ProcessInput(self, events, pressed_keys):
         for event in events:
@@ -291,17 +370,75 @@ class BoidsScene(SceneBase):
                               pressed_keys[pygame.K_RALT]
                 if event.key == pygame.K_p:
                     self.SwitchToScene(Pause(self))
-
-    def Update(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-        self.boids.update()
+                elif event.key == BoidsScene.PROFILE_KEY:
+                    self.showProfile = not self.showProfile
+                    self.profileSurf = None
+                    self.full_redraw = True
+            elif event.type == pygame.VIDEORESIZE:
+                self.full_redraw = True
+
+    def Update(self, dt=1.0):
+        # back from an overlay that paused a threaded flock
+        self.flock.resume()
+        self.flock.step(dt)
 
     def Render(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        alpha = self.interpolation if BoidsScene.INTERPOLATE else None
+        positions, velocities = self.flock.frame(alpha, out=self.display_positions)
+
+        dirty = BoidsScene.DIRTY_RECTS and not self.full_redraw \
+                and 2 * len(self.flock) <= BoidsScene.MAX_DIRTY_RECTS
+        if dirty:
+            rects = self.renderer.erase(self.screen, colors.BLACK)
+            if self.showProfile:
+                # the overlay may shrink, so clear all of its last box
+                rects.append(self.screen.fill(colors.BLACK, self.profileRect))
+            self.renderer.draw(self.screen, positions, velocities)
+            rects += self.renderer.rects()
+            if self.showProfile:
+                self.renderProfile()
+                rects.append(self.profileRect)
+            with self.profiler.phase('flip'):
+                pygame.display.update(rects)
+        else:
+            self.screen.fill(colors.BLACK)
+            self.renderer.draw(self.screen, positions, velocities)
+            if self.showProfile:
+                self.renderProfile()
+            with self.profiler.phase('flip'):
+                pygame.display.flip()
+            self.full_redraw = False
+
+    '''
+    Draws the frame time percentiles over the top-left corner, refreshing
+    the text every PROFILE_INTERVAL seconds
+    '''
+    def renderProfile(self):
+        now = time.time()
+        if self.profileSurf is None or now - self.profileTime > BoidsScene.PROFILE_INTERVAL:
+            self.profileTime = now
+            lines = [self.profileFont.render(line, True, colors.WHITE, colors.BLACK)
+                     for line in self.profiler.lines()]
+            width = max([line.get_width() for line in lines], default=0)
+            height = sum(line.get_height() for line in lines)
+            self.profileSurf = pygame.Surface([width, height])
+            y = 0
+            for line in lines:
+                self.profileSurf.blit(line, (0, y))
+                y += line.get_height()
+        self.profileRect = self.screen.blit(self.profileSurf, (0, 0))
 
-        self.screen.fill(colors.BLACK)
-        
-        self.boids.draw(self.screen)
-        pygame.display.flip()
\ No newline at end of file
+    def SwitchToScene(self, next_scene):
+        super().SwitchToScene(next_scene)
+        if next_scene is not self:
+            # overlays like Pause draw over us, so repaint fully on return
+            self.full_redraw = True
+            # a threaded flock waits on an Event instead of simulating behind the overlay
+            self.flock.pause()
+
+    '''
+    Releases the flock once the scene is left for good, e.g. for Start
+    '''
+    def Close(self):
+        if self.flock is not None:
+            self.flock.close()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import argparse
+import time
+import warnings
+import numpy as np
+from flock import FlockState
+import profiling
+
+'''
+Runs a flock without any rendering, as fast as the CPU allows. Nothing here
+imports pygame, so it can be used on servers for parameter sweeps and
+benchmarks.
+
+bounds: ((left, right), (top, bottom), (back, front)) of the flock's area
+n: number of boids
+params: overrides for the tunable FlockState parameters, by name
+seed: seed for the initial positions and velocities
+workers: step with a ParallelFlockState using this many processes, which
+always runs the numpy kernel
+spawn: initial position distribution, a name from spawning.SPAWNS or a function
+profiler: a profiling.Profiler to time each step and its phases into
+'''
+class Simulation:
+  def __init__(self, bounds, n, params=None, seed=None, neighbors='grid',
+               kernel='numpy', workers=None, profiler=None, spawn='uniform'):
+    rng = np.random.default_rng(seed)
+    if workers is not None:
+      from parallel import ParallelFlockState
+      if kernel != 'numpy':
+        warnings.warn(f'The {kernel} kernel does not run on parallel workers, '
+                      'falling back to the numpy kernel')
+      self.state = ParallelFlockState(n, bounds, rng, neighbors, params=params,
+                                      workers=workers, spawn=spawn)
+    else:
+      self.state = FlockState(n, bounds, rng, neighbors, kernel, params=params,
+                              spawn=spawn)
+    self.frames = 0
+    self.profiler = profiler or profiling.NULL
+    self.state.profiler = self.profiler
+    self.recorder = None
+
+  @property
+  def positions(self):
+    return self.state.positions
+
+  @property
+  def velocities(self):
+    return self.state.velocities
+
+  def step(self, dt=1.0):
+    with self.profiler.phase('update'):
+      self.state.step(dt)
+    self.frames += 1
+    if self.recorder is not None:
+      self.recorder.write(self.state)
+
+  '''
+  Records every following frame to a trajectory file with room for capacity
+  frames, see recording.TrajectoryRecorder
+  '''
+  def record(self, path, capacity, dtype='float32'):
+    from recording import TrajectoryRecorder
+    self.recorder = TrajectoryRecorder(path, self.state, capacity, dtype)
+    return self.recorder
+
+  '''
+  Steps the flock the given number of times, dt frames each, and returns the
+  elapsed time in seconds
+  '''
+  def run(self, frames, dt=1.0):
+    start = time.perf_counter()
+    for _ in range(frames):
+      self.step(dt)
+    return time.perf_counter() - start
+
+  def close(self):
+    if self.recorder is not None:
+      self.recorder.close()
+    if hasattr(self.state, 'close'):
+      self.state.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Run a flock of boids headless')
+  parser.add_argument('-n', '--boids', type=int, default=1000, help='number of boids')
+  parser.add_argument('-f', '--frames', type=int, default=100, help='frames to simulate')
+  parser.add_argument('--size', type=float, nargs=3, default=(1280, 720, 255),
+                      metavar=('WIDTH', 'HEIGHT', 'DEPTH'), help='size of the area')
+  parser.add_argument('--seed', type=int, default=None)
+  parser.add_argument('--spawn', default='uniform', help='uniform, sphere or clusters')
+  parser.add_argument('--neighbors', default='grid', help='brute, grid, kdtree, verlet, octree or knn')
+  parser.add_argument('--kernel', default='numpy', help='numpy or numba')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='step in parallel with this many processes')
+  parser.add_argument('--profile', default=None, metavar='PATH',
+                      help='write frame time percentiles to a .csv or .json file')
+  parser.add_argument('--record', default=None, metavar='PATH',
+                      help='write every frame to a trajectory file, see recording.py')
+  parser.add_argument('--quantize', action='store_true',
+                      help='record as int16 instead of float32')
+  parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                      help='override a flock parameter, e.g. VISIBLE_RANGE=80')
+  args = parser.parse_args()
+
+  params = {}
+  for param in args.param:
+    name, value = param.split('=', 1)
+    params[name] = float(value)
+
+  profiler = profiling.Profiler(max(args.frames, 1)) if args.profile else None
+  bounds = [(0, size) for size in args.size]
+  with Simulation(bounds, args.boids, params, args.seed, args.neighbors,
+                  args.kernel, args.workers, profiler, args.spawn) as simulation:
+    if args.record:
+      simulation.record(args.record, args.frames, 'int16' if args.quantize else 'float32')
+    elapsed = simulation.run(args.frames)
+  if profiler is not None:
+    profiler.export(args.profile)
+
+  print(f'{args.frames} frames of {args.boids} boids in {elapsed:.3f} s: '
+        f'{args.frames / elapsed:.1f} frames/s, '
+        f'{args.frames * args.boids / elapsed:.0f} boid updates/s')
+  index = simulation.state.index
+  if hasattr(index, 'rebuilds'):
+    print(f'neighbor list rebuilt {index.rebuilds} times in {index.builds} steps')
+
+
+if __name__ == '__main__':
+  main()
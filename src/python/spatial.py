@@ -0,0 +1,629 @@
+import numpy as np
+import itertools
+import math
+
+try:
+  from scipy.spatial import cKDTree
+except ImportError:
+  cKDTree = None
+
+'''
+Spatial indexes answering proximity queries over a set of 3D points.
+
+Every index is built from an (N, 3) array of positions and returns the pairs
+of points closer than a radius as three flat arrays (rows, cols, distances),
+with each unordered pair reported in both directions and rows sorted in
+ascending order. The same pairs are available in CSR form (indptr, cols,
+distances), where the neighbors of point i are cols[indptr[i]:indptr[i + 1]].
+
+Queries take an optional rows slice to only find the neighbors of points
+lo:hi, which lets workers split a query between them. Returned rows are
+still indices into the whole set, while CSR indptr then covers lo:hi only.
+'''
+class SpatialIndex:
+  APPROXIMATE = False # whether query_sums may approximate, see Octree
+  TOPOLOGICAL = False # whether neighbors are the nearest few instead of all within a range
+  SHARED = False # whether workers should share one build instead of each building, see shared()
+
+  def __init__(self):
+    self.positions = np.empty((0, 3))
+
+  def build(self, positions):
+    self.positions = positions
+
+  '''
+  Returns the arrays queries read after build(), by attribute name, so a
+  built index can be handed to worker processes
+  '''
+  def shared(self):
+    return {}
+
+  '''
+  Answers pair queries over positions from the arrays another copy of this
+  index returned from shared(), instead of building
+  '''
+  def attach(self, positions, arrays):
+    self.positions = positions
+    for name, array in arrays.items():
+      setattr(self, name, array)
+
+  '''
+  Returns the neighbors of every point within radius as CSR arrays
+  '''
+  def query_csr(self, radius, rows=None):
+    lo, hi = row_range(rows, len(self.positions))
+    rows, cols, distances = self.query_pairs(radius, slice(lo, hi))
+    counts = np.bincount(rows - lo, minlength=hi - lo)
+    indptr = np.zeros(len(counts) + 1, dtype=np.intp)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, cols, distances
+
+
+'''
+Checks every pair of points. Distances are computed in blocks of rows so
+memory stays at BLOCK_SIZE * N.
+'''
+class BruteForceIndex(SpatialIndex):
+  BLOCK_SIZE = 256
+
+  def query_pairs(self, radius, rows=None):
+    positions = self.positions
+    n = len(positions)
+    start, stop = row_range(rows, n)
+    rows, cols, distances = [], [], []
+    for lo in range(start, stop, self.BLOCK_SIZE):
+      hi = min(lo + self.BLOCK_SIZE, stop)
+      offsets = positions[lo:hi, np.newaxis, :] - positions[np.newaxis, :, :]
+      block = np.sqrt(np.einsum('ijk,ijk->ij', offsets, offsets))
+      diagonal = np.arange(hi - lo)
+      block[diagonal, diagonal + lo] = np.inf # a point is not its own neighbor
+      r, c = np.nonzero(block < radius)
+      rows.append(r + lo)
+      cols.append(c)
+      distances.append(block[r, c])
+    return _concatenate(rows, cols, distances)
+
+  def query_ball(self, point, radius):
+    distances = np.linalg.norm(self.positions - point, axis=1)
+    return np.flatnonzero(distances < radius)
+
+
+'''
+Hashes points into cubic cells of side cell_size, so a radius query only has
+to look at the cells around each point: the 27 surrounding cells when the
+radius is at most cell_size.
+
+Points are kept sorted by cell. Rebuilding from the previous frame's order
+is cheap since boids rarely change cells between frames.
+'''
+class UniformGrid(SpatialIndex):
+  def __init__(self, cell_size):
+    SpatialIndex.__init__(self)
+    self.cell_size = cell_size
+    self.order = np.empty(0, dtype=np.intp)
+
+  def build(self, positions):
+    self.positions = positions
+    cells = np.floor(positions / self.cell_size).astype(np.int64)
+    self.origin = cells.min(axis=0) if len(cells) else np.zeros(3, dtype=np.int64)
+    cells -= self.origin
+    self.shape = cells.max(axis=0) + 1 if len(cells) else np.ones(3, dtype=np.int64)
+    self.cells = cells
+
+    keys = self._keys(cells)
+    if len(self.order) != len(keys):
+      self.order = np.arange(len(keys))
+    # start from last build's order, which is nearly sorted already
+    self.order = self.order[np.argsort(keys[self.order], kind='stable')]
+    self.keys, self.starts, self.counts = np.unique(keys[self.order],
+                                                    return_index=True,
+                                                    return_counts=True)
+
+  def _keys(self, cells):
+    return (cells[:, 0] * self.shape[1] + cells[:, 1]) * self.shape[2] + cells[:, 2]
+
+  '''
+  Returns the start and count in self.order of each cell, or a count of 0 for
+  cells that are empty or outside the grid
+  '''
+  def _lookup(self, cells):
+    inside = np.all((cells >= 0) & (cells < self.shape), axis=1)
+    keys = self._keys(cells)
+    slots = np.searchsorted(self.keys, keys)
+    slots = np.minimum(slots, len(self.keys) - 1)
+    found = inside & (self.keys[slots] == keys)
+    return self.starts[slots], np.where(found, self.counts[slots], 0)
+
+  def _reach(self, radius):
+    return max(1, math.ceil(radius / self.cell_size))
+
+  def query_pairs(self, radius, rows=None):
+    lo, hi = row_range(rows, len(self.positions))
+    if hi <= lo:
+      return _concatenate([], [], [])
+    reach = self._reach(radius)
+    points = np.arange(lo, hi)
+    cells = self.cells[lo:hi]
+    rows, cols = [], []
+    for shift in itertools.product(range(-reach, reach + 1), repeat=3):
+      starts, counts = self._lookup(cells + shift)
+      r, c = _expand(points, starts, counts)
+      rows.append(r)
+      cols.append(self.order[c])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+
+    offsets = self.positions[rows] - self.positions[cols]
+    distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    keep = (distances < radius) & (rows != cols)
+    rows, cols, distances = rows[keep], cols[keep], distances[keep]
+    sort = np.lexsort((cols, rows))
+    return rows[sort], cols[sort], distances[sort]
+
+  def query_ball(self, point, radius):
+    if len(self.positions) == 0:
+      return np.empty(0, dtype=np.intp)
+    reach = self._reach(radius)
+    center = np.floor(np.asarray(point) / self.cell_size).astype(np.int64) - self.origin
+    shifts = np.array(list(itertools.product(range(-reach, reach + 1), repeat=3)))
+    starts, counts = self._lookup(center + shifts)
+    _, candidates = _expand(np.arange(len(shifts)), starts, counts)
+    candidates = self.order[candidates]
+    distances = np.linalg.norm(self.positions[candidates] - point, axis=1)
+    return np.sort(candidates[distances < radius])
+
+
+'''
+Wraps scipy's cKDTree, which answers the radius query for the whole set of
+points in one batched call. Requires scipy.
+'''
+class KDTreeIndex(SpatialIndex):
+  LEAF_SIZE = 16
+
+  def __init__(self):
+    if cKDTree is None:
+      raise ImportError('KDTreeIndex requires scipy')
+    SpatialIndex.__init__(self)
+    self.tree = None
+
+  def build(self, positions):
+    self.positions = positions
+    self.tree = cKDTree(positions, leafsize=self.LEAF_SIZE)
+
+  def query_pairs(self, radius, rows=None):
+    n = len(self.positions)
+    lo, hi = row_range(rows, n)
+    if hi <= lo:
+      return _concatenate([], [], [])
+    if (lo, hi) == (0, n):
+      tree = self.tree
+    else:
+      tree = cKDTree(self.positions[lo:hi], leafsize=self.LEAF_SIZE)
+    pairs = tree.sparse_distance_matrix(self.tree, radius,
+                                        output_type='ndarray')
+    owners = pairs['i'].astype(np.intp) + lo
+    cols = pairs['j'].astype(np.intp)
+    keep = (pairs['v'] < radius) & (owners != cols)
+    owners, cols, distances = owners[keep], cols[keep], pairs['v'][keep]
+    sort = np.lexsort((cols, owners))
+    return owners[sort], cols[sort], distances[sort]
+
+  def query_ball(self, point, radius):
+    if len(self.positions) == 0:
+      return np.empty(0, dtype=np.intp)
+    candidates = np.array(self.tree.query_ball_point(point, radius), dtype=np.intp)
+    distances = np.linalg.norm(self.positions[candidates] - point, axis=1)
+    return np.sort(candidates[distances < radius])
+
+
+'''
+Verlet neighbor list: caches every pair within cutoff + skin, found with an
+inner index, and answers queries up to cutoff by filtering those candidates
+with the current positions. A pair within cutoff now was within cutoff +
+skin at the last build as long as no point has moved more than skin / 2, so
+the list is only rebuilt once some point has.
+
+This only pays off with substeps. At dt = 1 boids move up to MAX_SPEED = 15
+units a step, so any skin either rebuilds nearly every step or filters so
+many candidates that it is slower than the inner index alone: 98 against
+82 ms a step for 'grid' at N = 2000. At dt = 0.25 (4 substeps a frame) the
+list lasts several steps and beats 'grid' by about a quarter, 49 against
+63 ms a step, and the skin hardly matters between 10 and 80. builds and
+rebuilds count the calls to build() and the actual rebuilds, for tuning it.
+'''
+class VerletList(SpatialIndex):
+  SHARED = True # a rebuild is a full neighbor search
+  SKIN = 40 # lasts about 5 steps at dt = 0.25, but only every other step at dt = 1
+
+  def __init__(self, cutoff, skin=None, index='grid'):
+    SpatialIndex.__init__(self)
+    self.cutoff = cutoff
+    self.skin = self.SKIN if skin is None else skin
+    self.index = create_index(index, cutoff + self.skin)
+    self.reference = None # positions at the last rebuild
+    self.builds = 0
+    self.rebuilds = 0
+
+  def build(self, positions):
+    self.positions = positions
+    self.builds += 1
+    if self.reference is not None and len(self.reference) == len(positions):
+      moved = positions - self.reference
+      farthest = np.max(np.einsum('ij,ij->i', moved, moved), initial=0)
+      if farthest <= (self.skin / 2) ** 2:
+        return
+
+    self.rebuilds += 1
+    self.reference = positions.copy()
+    self.index.build(self.reference)
+    self.indptr, self.cols, _ = self.index.query_csr(self.cutoff + self.skin)
+
+  def shared(self):
+    return {'indptr': self.indptr, 'cols': self.cols}
+
+  def _check(self, radius):
+    if radius > self.cutoff:
+      raise ValueError(f'VerletList only answers queries up to its cutoff {self.cutoff}')
+
+  def query_pairs(self, radius, rows=None):
+    self._check(radius)
+    lo, hi = row_range(rows, len(self.positions))
+    owners = np.repeat(np.arange(lo, hi), np.diff(self.indptr[lo:hi + 1]))
+    cols = self.cols[self.indptr[lo]:self.indptr[hi]]
+
+    offsets = self.positions[owners] - self.positions[cols]
+    distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    keep = distances < radius
+    return owners[keep], cols[keep], distances[keep]
+
+  def query_ball(self, point, radius):
+    self._check(radius)
+    if len(self.positions) == 0:
+      return np.empty(0, dtype=np.intp)
+    # anything within radius now was within radius + skin / 2 at the last build
+    candidates = self.index.query_ball(point, radius + self.skin / 2)
+    distances = np.linalg.norm(self.positions[candidates] - point, axis=1)
+    return candidates[distances < radius]
+
+
+'''
+Octree over the points, built level by level from Morton-sorted cells down
+to leaves of at most LEAF_SIZE points. Every node caches its point count and
+the sum of its positions.
+
+Besides exact pair queries, query_sums() returns for each point the count
+and the sum of some per-point values (e.g. positions and velocities) over
+its neighbors within a radius, Barnes-Hut style:
+- nodes entirely inside the radius add their aggregates without being opened
+- nodes that look small from the point, size < theta * distance to their
+center of mass, count as a single body at that center: all in or all out
+- everything else is opened, down to exact pairs at the leaves
+theta = 0 gives exact sums; larger opening angles open fewer nodes, trading
+accuracy near the edge of the radius for speed. theta must stay below 0.5 so
+a node holding the querying point itself is never approximated.
+
+Queries walk the tree for all points at once, one level at a time.
+'''
+class Octree(SpatialIndex):
+  APPROXIMATE = True
+  LEAF_SIZE = 16
+  MAX_DEPTH = 16
+  THETA = 0.3
+
+  def __init__(self, theta=None):
+    SpatialIndex.__init__(self)
+    self.theta = self.THETA if theta is None else theta
+    if not 0 <= self.theta < 0.5:
+      raise ValueError('The opening angle must be at least 0 and below 0.5')
+    self.levels = []
+
+  def build(self, positions):
+    self.positions = positions
+    n = len(positions)
+    self.levels = []
+    if n == 0:
+      return
+    self.origin = positions.min(axis=0)
+    self.extent = max(float(np.max(positions.max(axis=0) - self.origin)), 1e-9) * (1 + 1e-9)
+
+    # cells at the deepest level, then each point's key down the tree
+    depth = self.MAX_DEPTH
+    cells = np.floor((positions - self.origin) / self.extent * 2 ** depth).astype(np.int64)
+    np.clip(cells, 0, 2 ** depth - 1, out=cells)
+    keys = np.zeros(n, dtype=np.int64)
+    point_keys = []
+    for level in range(depth + 1):
+      if level:
+        bits = (cells >> (depth - level)) & 1
+        keys = (keys << 3) | (bits[:, 0] << 2) | (bits[:, 1] << 1) | bits[:, 2]
+      point_keys.append(keys)
+    self.order = np.argsort(keys, kind='stable')
+    sorted_positions = positions[self.order]
+
+    for level in range(depth + 1):
+      level_keys, starts, counts = np.unique(point_keys[level][self.order],
+                                             return_index=True, return_counts=True)
+      self.levels.append({
+        'keys': level_keys,
+        'starts': starts,
+        'counts': counts,
+        'cells': cells[self.order[starts]] >> (depth - level),
+        'size': self.extent / 2 ** level,
+        'sums': np.add.reduceat(sorted_positions, starts, axis=0),
+      })
+      if counts.max() <= self.LEAF_SIZE:
+        break
+
+    for parent, child in zip(self.levels[:-1], self.levels[1:]):
+      parent['children'] = np.searchsorted(child['keys'], parent['keys'] << 3)
+      parent['child_counts'] = np.searchsorted(child['keys'], (parent['keys'] + 1) << 3) \
+                               - parent['children']
+
+  '''
+  Walks the tree for every point, returning the nodes taken whole as
+  per-level (owners, nodes) pairs and the leaf members to check one by one
+  as (owners, cols) candidates
+  '''
+  def _walk(self, points, owners, radius, theta):
+    taken = []
+    candidates_owners, candidates_cols = [], []
+    nodes = np.zeros(len(owners), dtype=np.intp)
+    r2 = radius * radius
+    last = len(self.levels) - 1
+    for depth, level in enumerate(self.levels):
+      if len(owners) == 0:
+        break
+      p = points[owners]
+      low = self.origin + level['cells'][nodes] * level['size']
+      high = low + level['size']
+      nearest = np.clip(p, low, high) - p
+      farthest = np.maximum(np.abs(p - low), np.abs(p - high))
+      near = np.einsum('ij,ij->i', nearest, nearest) < r2
+      owners, nodes, p = owners[near], nodes[near], p[near]
+      farthest = farthest[near]
+
+      counts = level['counts'][nodes]
+      inside = np.einsum('ij,ij->i', farthest, farthest) < r2
+      if depth == last:
+        leaf = np.ones(len(nodes), dtype=bool)
+      else:
+        leaf = counts <= self.LEAF_SIZE
+      whole = inside
+      if theta > 0:
+        offsets = level['sums'][nodes] / counts[:, np.newaxis] - p
+        distances2 = np.einsum('ij,ij->i', offsets, offsets)
+        far = ~inside & ~leaf & (level['size'] ** 2 < theta * theta * distances2)
+        whole = inside | (far & (distances2 < r2))
+        leaf &= ~far
+        opened = ~inside & ~leaf & ~far
+      else:
+        opened = ~inside & ~leaf
+      leaf &= ~inside
+      taken.append((owners[whole], nodes[whole]))
+
+      o, c = _expand(owners[leaf], level['starts'][nodes[leaf]], counts[leaf])
+      candidates_owners.append(o)
+      candidates_cols.append(self.order[c])
+
+      if depth < last:
+        owners, nodes = _expand(owners[opened], level['children'][nodes[opened]],
+                                level['child_counts'][nodes[opened]])
+    return taken, candidates_owners, candidates_cols
+
+  def query_pairs(self, radius, rows=None):
+    lo, hi = row_range(rows, len(self.positions))
+    if hi <= lo or not self.levels:
+      return _concatenate([], [], [])
+    points = self.positions
+    taken, owners, cols = self._walk(points, np.arange(lo, hi), radius, 0)
+    for depth, (o, nodes) in enumerate(taken):
+      level = self.levels[depth]
+      o, c = _expand(o, level['starts'][nodes], level['counts'][nodes])
+      owners.append(o)
+      cols.append(self.order[c])
+    owners, cols = np.concatenate(owners), np.concatenate(cols)
+
+    offsets = points[owners] - points[cols]
+    distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    keep = (distances < radius) & (owners != cols)
+    owners, cols, distances = owners[keep], cols[keep], distances[keep]
+    sort = np.lexsort((cols, owners))
+    return owners[sort], cols[sort], distances[sort]
+
+  '''
+  Returns (counts, sums): for each point in rows, how many other points are
+  within radius and the sum of their rows of values, an (N, k) array. Uses
+  the Barnes-Hut approximation with opening angle theta, self.theta if None.
+  '''
+  def query_sums(self, radius, values, rows=None, theta=None):
+    theta = self.theta if theta is None else theta
+    lo, hi = row_range(rows, len(self.positions))
+    counts = np.zeros(hi - lo)
+    sums = np.zeros((hi - lo, values.shape[1]))
+    if hi <= lo or not self.levels:
+      return counts, sums
+
+    points = self.positions
+    taken, owners, cols = self._walk(points, np.arange(lo, hi), radius, theta)
+    sorted_values = values[self.order]
+    for depth, (o, nodes) in enumerate(taken):
+      if len(o) == 0:
+        continue
+      level = self.levels[depth]
+      node_sums = np.add.reduceat(sorted_values, level['starts'], axis=0)
+      counts += np.bincount(o - lo, weights=level['counts'][nodes], minlength=hi - lo)
+      for k in range(values.shape[1]):
+        sums[:, k] += np.bincount(o - lo, weights=node_sums[nodes, k], minlength=hi - lo)
+
+    owners, cols = np.concatenate(owners), np.concatenate(cols)
+    offsets = points[owners] - points[cols]
+    close = np.einsum('ij,ij->i', offsets, offsets) < radius * radius
+    owners, cols = owners[close] - lo, cols[close]
+    counts += np.bincount(owners, minlength=hi - lo)
+    neighbors = values[cols]
+    for k in range(values.shape[1]):
+      sums[:, k] += np.bincount(owners, weights=neighbors[:, k], minlength=hi - lo)
+
+    # every point was counted among its own neighbors
+    counts -= 1
+    sums -= values[lo:hi]
+    return counts, sums
+
+  def query_ball(self, point, radius):
+    if not self.levels:
+      return np.empty(0, dtype=np.intp)
+    point = np.asarray(point, dtype=float)[np.newaxis]
+    taken, _, cols = self._walk(point, np.zeros(1, dtype=np.intp), radius, 0)
+    for depth, (o, nodes) in enumerate(taken):
+      level = self.levels[depth]
+      _, c = _expand(o, level['starts'][nodes], level['counts'][nodes])
+      cols.append(self.order[c])
+    cols = np.concatenate(cols)
+    distances = np.linalg.norm(self.positions[cols] - point, axis=1)
+    return np.sort(cols[distances < radius])
+
+
+'''
+Topological neighbors: each point's K nearest other points, whatever their
+distance, the way starlings follow about 7 neighbors. Pair queries return
+those K neighbors that are within the radius; the pairs are not symmetric
+since i can be among j's nearest without j being among i's.
+
+Every build searches the K nearest from scratch, with scipy's cKDTree if
+available and in blocks of BLOCK_SIZE rows otherwise. Reusing the last
+build's neighbors isn't worth it: boids move 10 to 15 units a frame, a
+large part of the spacing between neighbors, so at dt = 1 nearly every
+point's neighbors change between frames and checking only old neighbors
+misses most of the new ones.
+'''
+class KNearestIndex(SpatialIndex):
+  TOPOLOGICAL = True
+  SHARED = True # a build is the whole neighbor search
+  K = 7
+  BLOCK_SIZE = 256
+
+  def __init__(self, k=None):
+    SpatialIndex.__init__(self)
+    self.k = self.K if k is None else k
+    self.neighbors = None # (N, k) indices of each point's nearest, sorted
+    self.distances = None
+
+  def build(self, positions):
+    self.positions = positions
+    n = len(positions)
+    k = max(0, min(self.k, n - 1))
+    neighbors = self._search(positions, k)
+    neighbors.sort(axis=1)
+    offsets = positions[neighbors] - positions[:, np.newaxis, :]
+    self.neighbors = neighbors
+    self.distances = np.sqrt(np.einsum('ijk,ijk->ij', offsets, offsets))
+
+  def shared(self):
+    return {'neighbors': self.neighbors, 'distances': self.distances}
+
+  '''
+  Returns the k nearest neighbors of every point
+  '''
+  def _search(self, positions, k):
+    n = len(positions)
+    if k == 0:
+      return np.empty((n, 0), dtype=np.intp)
+    if cKDTree is not None:
+      _, found = cKDTree(positions).query(positions, k + 1)
+      found = found.astype(np.intp)
+      # drop each point itself, or the farthest if a duplicate hid it
+      own = found == np.arange(n)[:, np.newaxis]
+      drop = np.where(own.any(axis=1), np.argmax(own, axis=1), k)
+      keep = np.ones_like(own)
+      keep[np.arange(n), drop] = False
+      return found[keep].reshape(n, k)
+
+    neighbors = np.empty((n, k), dtype=np.intp)
+    for lo in range(0, n, self.BLOCK_SIZE):
+      hi = min(lo + self.BLOCK_SIZE, n)
+      offsets = positions[lo:hi, np.newaxis, :] - positions[np.newaxis, :, :]
+      block = np.einsum('ijk,ijk->ij', offsets, offsets)
+      block[np.arange(hi - lo), np.arange(lo, hi)] = np.inf
+      neighbors[lo:hi] = np.argpartition(block, k - 1, axis=1)[:, :k]
+    return neighbors
+
+  def query_pairs(self, radius, rows=None):
+    lo, hi = row_range(rows, len(self.positions))
+    k = self.neighbors.shape[1]
+    owners = np.repeat(np.arange(lo, hi), k)
+    cols = self.neighbors[lo:hi].ravel()
+    distances = self.distances[lo:hi].ravel()
+    keep = distances < radius
+    return owners[keep], cols[keep], distances[keep]
+
+  '''
+  Returns the points within radius of point, searched exactly
+  '''
+  def query_ball(self, point, radius):
+    distances = np.linalg.norm(self.positions - point, axis=1)
+    return np.flatnonzero(distances < radius)
+
+
+'''
+Returns the (lo, hi) bounds of a rows slice over n points, all of them if
+rows is None
+'''
+def row_range(rows, n):
+  if rows is None:
+    return 0, n
+  span = range(n)[rows]
+  if span.step != 1:
+    raise ValueError('Row slices must be contiguous')
+  return span.start, span.stop
+
+
+'''
+Sums the rows of values belonging to each CSR segment into out, leaving
+empty segments at zero
+'''
+def reduce_rows(indptr, values, out):
+  counts = np.diff(indptr)
+  nonempty = counts > 0
+  out[...] = 0
+  if np.any(nonempty):
+    out[nonempty] = np.add.reduceat(values, indptr[:-1][nonempty], axis=0)
+  return out
+
+
+'''
+Expands per-row (start, count) ranges into flat (row, position) pairs
+'''
+def _expand(rows, starts, counts):
+  total = counts.sum()
+  ends = np.cumsum(counts)
+  within = np.arange(total) - np.repeat(ends - counts, counts)
+  return np.repeat(rows, counts), np.repeat(starts, counts) + within
+
+
+def _concatenate(rows, cols, distances):
+  if not rows:
+    return (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp),
+            np.empty(0))
+  return np.concatenate(rows), np.concatenate(cols), np.concatenate(distances)
+
+
+INDEXES = {
+  'brute': lambda cell_size: BruteForceIndex(),
+  'grid': UniformGrid,
+  'kdtree': lambda cell_size: KDTreeIndex(),
+  'verlet': lambda cell_size: VerletList(cell_size),
+  'octree': lambda cell_size: Octree(),
+  'knn': lambda cell_size: KNearestIndex(),
+}
+
+'''
+Creates a spatial index by name, or passes an existing index through
+'''
+def create_index(index, cell_size):
+  if isinstance(index, str):
+    try:
+      return INDEXES[index](cell_size)
+    except KeyError:
+      raise ValueError(f'Unknown spatial index {index!r}, '
+                       f'expected one of {sorted(INDEXES)}')
+  return index
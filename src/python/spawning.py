@@ -0,0 +1,59 @@
+import numpy as np
+
+'''
+Spawn distributions for the initial positions of a flock. Each takes a
+numpy Generator, the number of boids and the low and high corners of the
+area, and draws all positions in one vectorized call, so a seeded Generator
+always spawns the same flock.
+'''
+CLUSTERS = 5 # number of blobs for clusters()
+SPREAD = 0.05 # standard deviation of each blob, as a fraction of the area
+
+'''
+Anywhere in the area, uniformly
+'''
+def uniform_box(rng, n, low, high):
+  return low + (high - low) * rng.random((n, 3))
+
+'''
+Uniformly inside the largest ball centered in the area
+'''
+def sphere(rng, n, low, high):
+  center = (low + high) / 2
+  radius = np.min(high - low) / 2
+  directions = rng.standard_normal((n, 3))
+  norms = np.linalg.norm(directions, axis=1, keepdims=True)
+  np.divide(directions, norms, out=directions, where=norms > 0)
+  distances = radius * np.cbrt(rng.random((n, 1)))
+  return center + directions * distances
+
+'''
+In CLUSTERS Gaussian blobs with random centers, each SPREAD of the area's
+size wide, clipped to the area
+'''
+def clusters(rng, n, low, high):
+  size = high - low
+  centers = low + size * (0.2 + 0.6 * rng.random((CLUSTERS, 3)))
+  members = rng.integers(CLUSTERS, size=n)
+  positions = centers[members] + rng.standard_normal((n, 3)) * size * SPREAD
+  return np.clip(positions, low, high, out=positions)
+
+
+SPAWNS = {
+  'uniform': uniform_box,
+  'sphere': sphere,
+  'clusters': clusters,
+}
+
+'''
+Draws n positions from a spawn distribution given by name, or from any
+function taking (rng, n, low, high)
+'''
+def spawn(distribution, rng, n, low, high):
+  if isinstance(distribution, str):
+    try:
+      distribution = SPAWNS[distribution]
+    except KeyError:
+      raise ValueError(f'Unknown spawn distribution {distribution!r}, '
+                       f'expected one of {sorted(SPAWNS)}')
+  return distribution(rng, n, np.asarray(low, dtype=float), np.asarray(high, dtype=float))
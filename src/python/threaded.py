@@ -0,0 +1,161 @@
+import threading
+import time
+import numpy as np
+from timing import FixedTimestep
+
+'''
+A read-only copy of a flock's state after some step, handed from a
+FlockThread to the render loop.
+
+frame: number of steps taken when the snapshot was made
+time: time.perf_counter() when the snapshot was made
+positions, velocities: the state after the step
+previous: the positions one step earlier, for interpolating
+'''
+class Snapshot:
+  def __init__(self, n):
+    self.frame = 0
+    self.time = 0.0
+    self.positions = np.zeros((n, 3))
+    self.velocities = np.zeros((n, 3))
+    self.previous = np.zeros((n, 3))
+    self.freeze()
+
+  def freeze(self):
+    for array in (self.positions, self.velocities, self.previous):
+      array.flags.writeable = False
+
+  def thaw(self):
+    for array in (self.positions, self.velocities, self.previous):
+      array.flags.writeable = True
+
+  '''
+  Returns the positions a fraction alpha of a step after previous
+  '''
+  def interpolate(self, alpha, out=None):
+    out = np.subtract(self.positions, self.previous, out=out)
+    out *= alpha
+    out += self.previous
+    return out
+
+
+'''
+Steps a FlockState on a background thread at a fixed rate, so simulating
+never holds up event handling and rendering, and the other way around.
+
+After every step the thread copies the state into a Snapshot and publishes
+it. There are three snapshots: the one the thread writes, the latest ready
+one, and the one the render loop reads. Publishing and reading only swap
+which is which under a lock, so the thread never writes a snapshot that is
+being read and neither side waits on the other's copying or drawing.
+
+pause() parks the thread on an Event until resume(), without polling.
+
+state: the FlockState to step; only the thread may touch it once started
+rate, substeps: steps of dt = 1 / substeps frames, at rate frames per second
+'''
+class FlockThread:
+  def __init__(self, state, rate=60, substeps=1):
+    self.state = state
+    self.timestep = FixedTimestep(rate, substeps)
+    self.frame = 0
+    self.error = None
+
+    self.snapshots = [Snapshot(len(state)) for _ in range(3)]
+    self.writing, self.ready, self.reading = 0, 1, 2
+    self.fresh = False
+    self.lock = threading.Lock()
+    self.write(self.snapshots[self.reading])
+
+    self.resumed = threading.Event()
+    self.resumed.set()
+    self.stopping = threading.Event()
+    self.thread = threading.Thread(target=self.run, name='FlockThread', daemon=True)
+
+  @property
+  def paused(self):
+    return not self.resumed.is_set()
+
+  @property
+  def step_time(self):
+    return self.timestep.step_time
+
+  def start(self):
+    self.thread.start()
+    return self
+
+  def pause(self):
+    self.resumed.clear()
+
+  def resume(self):
+    self.resumed.set()
+
+  def stop(self):
+    self.stopping.set()
+    self.resumed.set()
+    if self.thread.is_alive():
+      self.thread.join()
+
+  def run(self):
+    timestep = self.timestep
+    try:
+      while not self.stopping.is_set():
+        if not self.resumed.is_set():
+          self.resumed.wait()
+          # don't catch up on the time spent paused
+          timestep.reset()
+          continue
+
+        steps, _ = timestep.advance()
+        for _ in range(steps):
+          self.state.step(timestep.dt)
+          self.frame += 1
+        if steps:
+          self.publish()
+        # sleep until the next step is due
+        self.stopping.wait(timestep.step_time - timestep.accumulator)
+    except Exception as error:
+      self.error = error
+
+  def write(self, snapshot):
+    snapshot.thaw()
+    np.copyto(snapshot.positions, self.state.positions)
+    np.copyto(snapshot.velocities, self.state.velocities)
+    np.copyto(snapshot.previous, self.state.next_positions)
+    snapshot.frame = self.frame
+    snapshot.time = time.perf_counter()
+    snapshot.freeze()
+
+  def publish(self):
+    self.write(self.snapshots[self.writing])
+    with self.lock:
+      self.writing, self.ready = self.ready, self.writing
+      self.fresh = True
+
+  '''
+  Returns the newest published Snapshot. It stays unchanged until the next
+  call, which may hand out a newer one.
+  '''
+  def latest(self):
+    if self.error is not None:
+      raise RuntimeError('FlockThread stopped with an error') from self.error
+    with self.lock:
+      if self.fresh:
+        self.reading, self.ready = self.ready, self.reading
+        self.fresh = False
+    return self.snapshots[self.reading]
+
+  '''
+  Returns how far between snapshot.previous and snapshot.positions to render
+  now, as a fraction of a step
+  '''
+  def alpha(self, snapshot, now=None):
+    if now is None:
+      now = time.perf_counter()
+    return min(max((now - snapshot.time) / self.step_time, 0.0), 1.0)
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
@@ -0,0 +1,68 @@
+import time
+
+'''
+Fixed-timestep scheduler decoupling simulation steps from rendered frames.
+
+Real time is collected in an accumulator and spent in fixed steps of
+dt = 1 / substeps frames, where a frame is 1 / rate seconds. So the
+simulation advances at the same speed however fast frames are rendered,
+and it takes substeps steps per frame when rendering keeps up.
+
+When the loop falls behind, advance() asks to skip rendering so the next
+calls can catch up, for at most MAX_FRAME_SKIP frames in a row. Time that
+still cannot be caught up after that is dropped rather than accumulated.
+Less than a frame of whole steps left over by max_steps is carried to the
+next call, and alpha stays at 1 until they are taken, so rendering never
+extrapolates past the current state.
+'''
+class FixedTimestep:
+  MAX_FRAME_SKIP = 5 # frames that may go unrendered in a row while catching up
+
+  def __init__(self, rate, substeps=1, max_steps=None):
+    self.rate = rate
+    self.substeps = substeps
+    self.dt = 1 / substeps # in frames
+    self.step_time = 1 / (rate * substeps) # in seconds
+    self.max_steps = max_steps or 4 * substeps # steps per call at most
+    self.accumulator = 0.0
+    self.last = None
+    self.skipped = 0
+    self.alpha = 0.0
+
+  def reset(self):
+    self.accumulator = 0.0
+    self.last = None
+    self.skipped = 0
+
+  '''
+  Collects the time since the last call and returns (steps, render): how
+  many steps of dt to take, and whether to render afterwards. self.alpha is
+  then the fraction of a step left over, from 0 to 1, for interpolating the
+  rendering.
+  '''
+  def advance(self, now=None):
+    if now is None:
+      now = time.perf_counter()
+    if self.last is None:
+      elapsed = self.substeps * self.step_time # start with one frame
+    else:
+      elapsed = now - self.last
+    self.last = now
+    self.accumulator += elapsed
+
+    # the epsilon keeps rounding error from postponing a step to the next call
+    steps = min(int(self.accumulator / self.step_time + 1e-6), self.max_steps)
+    self.accumulator = max(0.0, self.accumulator - steps * self.step_time)
+
+    behind = self.accumulator >= self.substeps * self.step_time
+    render = not behind or self.skipped >= self.MAX_FRAME_SKIP
+    if render:
+      self.skipped = 0
+      if behind:
+        # give up on catching up, drop whole steps we could not take
+        self.accumulator %= self.step_time
+    else:
+      self.skipped += 1
+
+    self.alpha = min(self.accumulator / self.step_time, 1.0)
+    return steps, render